@@ -10,12 +10,13 @@ CDLL('libgtk4-layer-shell.so')
 import gi
 import os
 import logging
-from subprocess import run, CalledProcessError
 import json
-import time
 import common as c
+from common.watchdog import DEFAULT_BUDGET_MS
+import config as Config
 import module
 import ipc
+from startup_trace import tracer
 gi.require_version('Gtk', '4.0')
 gi.require_version('Gtk4LayerShell', '1.0')
 from gi.repository import Gtk, Gdk, Gtk4LayerShell, GLib  # noqa
@@ -23,6 +24,21 @@ from gi.repository import Gtk, Gdk, Gtk4LayerShell, GLib  # noqa
 # Import DBus for sleep/resume handling
 from gi.repository import Gio
 
+SECTION_KEYS = ('modules-left', 'modules-center', 'modules-right')
+
+# Connector names can lag behind a hotplug; retry this often, this many
+# times, before falling back to a generic name.
+MONITOR_NAME_RETRY_MS = 200
+MONITOR_NAME_RETRIES = 3
+
+# Top-level config keys that only feed the generated CSS, so an in-place
+# reload can apply them without rebuilding any widgets.
+CSS_ONLY_KEYS = {
+    'font-size', 'corner-radius', 'bar-opacity', 'popover-opacity', 'style'
+}
+# Keys applied directly without touching any widget.
+LIVE_KEYS = {'stall-budget', 'cache'}
+
 
 class Display:
     """ Display class """
@@ -92,14 +108,16 @@ class Display:
         self.ipc.start()
 
     def get_wm(self):
-        try:
-            run(['swaymsg', '-q'], check=True)
-            return 'sway'
-        except CalledProcessError:
-            return 'hyprland'
+        # Detected once for the whole process by the compositor bus.
+        return c.compositor.wm or 'hyprland'
 
     def apply_css(self):
         """Apply default and user CSS"""
+        with tracer.span('apply_css'):
+            self._apply_css()
+
+    def _apply_css(self):
+        """Replace the CSS providers with default, dynamic and user CSS"""
         self.clear_css()
         
         # Load default CSS
@@ -245,9 +263,9 @@ class Display:
 
     def _schedule_reload(self):
         """
-        Debounced reload: reset the 5s timer on each call.
+        Debounced restart: reset the 5s timer on each call.
         Only fires once the timer elapses without being reset,
-        so multiple rapid monitor-add events collapse into one reload.
+        so multiple rapid wake events collapse into one restart.
         """
         if self._reload_timer_id is not None:
             GLib.source_remove(self._reload_timer_id)
@@ -256,9 +274,9 @@ class Display:
         )
 
     def _do_reload(self):
-        """ Timer callback: clear the timer ID and trigger a reload """
+        """ Timer callback: clear the timer ID and trigger a restart """
         self._reload_timer_id = None
-        self.reload()
+        self.restart()
         return False
 
     def get_monitors(self):
@@ -269,54 +287,44 @@ class Display:
     def get_plugs(self):
         """
         Get monitor plug names for Wayland outputs.
-        Tries multiple methods and retries to get proper connector names.
+        Falls back to a generic name if no connector name is available.
         """
         plugs = []
         for monitor in self.monitors:
             name = self._get_monitor_name(monitor, len(plugs))
-            plugs.append(name)
+            plugs.append(name or self._fallback_monitor_name(len(plugs)))
         return plugs
 
-    def _get_monitor_name(self, monitor, index, max_retries=3):
+    def _get_monitor_name(self, monitor, index):
         """
-        Get monitor name with retry logic.
-        After suspend, connector info may not be immediately available.
+        Get the connector (or model) name of a monitor, or None if GDK
+        hasn't filled it in yet (common right after hotplug or resume).
         """
-        for attempt in range(max_retries):
-            # Try to get the connector name (e.g., eDP-1, HDMI-A-1)
-            name = None
-            try:
-                name = monitor.get_connector()
-            except AttributeError:
-                pass
-
+        # Try to get the connector name (e.g., eDP-1, HDMI-A-1)
+        try:
+            name = monitor.get_connector()
             if name:
                 logging.debug(
                     f"Got connector name '{name}' for monitor {index}"
                 )
                 return name
+        except AttributeError:
+            pass
 
-            # Try model as fallback
-            if not name:
-                try:
-                    name = monitor.get_model()
-                    if name:
-                        logging.debug(
-                            f"Using model name '{name}' for monitor {index}"
-                        )
-                        return name
-                except AttributeError:
-                    pass
-
-            # If we still don't have a name and haven't exhausted retries
-            if attempt < max_retries - 1:
+        # Try model as fallback
+        try:
+            name = monitor.get_model()
+            if name:
                 logging.debug(
-                    f"Connector not available for monitor {index}, "
-                    f"retrying... (attempt {attempt + 1}/{max_retries})"
+                    f"Using model name '{name}' for monitor {index}"
                 )
-                time.sleep(0.2)
+                return name
+        except AttributeError:
+            pass
+        return None
 
-        # Last resort: use generic name but log warning
+    def _fallback_monitor_name(self, index):
+        """ Last resort: use generic name but log warning """
         fallback = f"monitor_{index}"
         logging.warning(
             f"Could not get connector name for monitor {index}, "
@@ -326,27 +334,68 @@ class Display:
         return fallback
 
     def on_monitors_changed(self, model, position, removed, added):
-        """ Handle monitor changes """
+        """
+        Handle monitor changes incrementally: destroy bars for removed
+        monitors and build bars for new ones on the running module
+        instances, leaving every other bar untouched.
+        """
+        current = self.get_monitors()
+        known = dict(zip(self.monitors, self.plugs))
         if removed > 0:
             # Destroy bars for monitors no longer present
-            current_plugs = set(
-                self._get_monitor_name(m, i)
-                for i, m in enumerate(self.get_monitors())
-            )
-            for plug in list(self.bars):
-                if plug not in current_plugs:
-                    bar = self.bars.pop(plug)
-                    try:
-                        bar.window.destroy()
-                    except Exception as e:
-                        logging.warning(
-                            "Error destroying bar for %s: %s", plug, e
-                        )
+            for monitor, plug in list(known.items()):
+                if monitor in current:
+                    continue
+                del known[monitor]
+                if plug in self.bars:
+                    self._destroy_bar(plug)
                     logging.info(
                         "Removed bar for disconnected monitor %s", plug
                     )
-        if added > 0:
-            self._schedule_reload()
+        self.monitors = [m for m in current if m in known]
+        self.plugs = [known[m] for m in self.monitors]
+
+        for index in range(position, position + added):
+            monitor = model.get_item(index)
+            if monitor is not None and monitor not in known:
+                self._add_monitor(monitor, index)
+
+    def _add_monitor(self, monitor, index, attempt=0):
+        """
+        Build a bar for a newly connected monitor. Connector names may
+        not be available yet, so retry on a GLib timeout rather than
+        blocking the main loop.
+        """
+        if monitor not in self.get_monitors() or monitor in self.monitors:
+            return False
+        name = self._get_monitor_name(monitor, index)
+        if name is None:
+            if attempt < MONITOR_NAME_RETRIES - 1:
+                logging.debug(
+                    f"Connector not available for monitor {index}, "
+                    f"retrying... (attempt {attempt + 1}/"
+                    f"{MONITOR_NAME_RETRIES})"
+                )
+                GLib.timeout_add(
+                    MONITOR_NAME_RETRY_MS, self._add_monitor,
+                    monitor, index, attempt + 1
+                )
+                return False
+            name = self._fallback_monitor_name(index)
+
+        # A monitor can briefly reappear as a new object with the same
+        # connector; replace the old bar and its entries rather than
+        # stacking two.
+        if name in self.bars:
+            self._destroy_bar(name)
+        if name in self.plugs:
+            keep = [i for i, plug in enumerate(self.plugs) if plug != name]
+            self.monitors = [self.monitors[i] for i in keep]
+            self.plugs = [self.plugs[i] for i in keep]
+        self.monitors.append(monitor)
+        self.plugs.append(name)
+        self.draw_bar(monitor)
+        return False
 
     def draw_bar(self, monitor):
         """ Draw a bar on a monitor """
@@ -355,29 +404,11 @@ class Display:
             logging.warning(f"Monitor is invalid, skipping: {monitor}")
             return
 
-        try_count = 0
-        plug = None
-        while try_count < 3:
-            try:
-                # Check if monitor is in our list
-                if monitor not in self.monitors:
-                    logging.warning(f"Monitor not in active monitors list: {monitor}")
-                    return
-
-                index = self.monitors.index(monitor)
-                plug = self.plugs[index]
-                break
-            except (IndexError, ValueError) as e:
-                logging.warning(f"Failed to find monitor index (attempt {try_count}): {e}")
-                try_count += 1
-                if try_count >= 3:
-                    logging.error("Max retries reached for monitor lookup")
-                    return
-                time.sleep(1)
-
-        if plug is None:
-            logging.error("Failed to determine monitor plug name")
+        # Check if monitor is in our list
+        if monitor not in self.monitors:
+            logging.warning(f"Monitor not in active monitors list: {monitor}")
             return
+        plug = self.plugs[self.monitors.index(monitor)]
 
         # Check against outputs filter
         if 'outputs' in list(self.config):
@@ -386,25 +417,40 @@ class Display:
                 return
 
         try:
-            bar = Bar(self, monitor)
-            bar.populate()
-            # CSS is now handled globally by Display
-            bar.start()
+            tracer.expect_paint(plug)
+            with tracer.span('draw_bar', monitor=plug):
+                bar = Bar(self, monitor)
+                with tracer.span('populate', monitor=plug):
+                    bar.populate()
+                # CSS is now handled globally by Display
+                bar.start()
+            if tracer.enabled:
+                self._trace_first_paint(bar, plug)
             self.bars[plug] = bar
             logging.info(f"Successfully created bar on {plug}")
         except Exception as e:
             logging.error(f"Failed to create bar on {plug}: {e}", exc_info=True)
 
+    def _trace_first_paint(self, bar, plug):
+        """ Mark the first frame a new bar paints in the startup trace """
+        clock = bar.window.get_frame_clock()
+        if clock is None:
+            tracer.painted(plug)
+            return
+
+        def on_after_paint(frame_clock):
+            frame_clock.disconnect(handler_id)
+            tracer.painted(plug)
+
+        handler_id = clock.connect('after-paint', on_after_paint)
+
     def draw_all(self):
         """ Initialize all monitors """
         for monitor in self.monitors:
             self.draw_bar(monitor)
 
-    def reload(self):
-        """ Reload by replacing the process image """
-        import module
-        # Signal completion before exec so the settings window
-        # isn't left waiting for a response that will never come.
+    def _signal_reload_done(self):
+        """ Tell the settings window that the reload has been handled """
         try:
             with open(self.reload_done_file, 'w') as f:
                 f.write('done')
@@ -413,6 +459,110 @@ class Display:
                 f"Failed to signal reload completion: {e}",
                 name='display', color='red'
             )
+
+    def reload(self):
+        """
+        Reload the config in place, restarting only the modules whose
+        config changed and rebuilding only the bar sections that use
+        them. Falls back to restart() if the diff can't be applied.
+        """
+        try:
+            new_config = Config.load(self.app.config_path)
+            new_config.setdefault('cache', '~/.cache/pybar')
+            self._apply_config(new_config)
+        except Exception:
+            logging.error(
+                "In-place reload failed; restarting", exc_info=True)
+            self.restart()
+            return False
+        self._signal_reload_done()
+        logging.info("Configuration reloaded in place")
+        return False
+
+    def _apply_config(self, new_config):
+        """ Diff new_config against the running one and apply it """
+        old_config = self.config
+        old_modules = old_config.get('modules', {})
+        new_modules = new_config.get('modules', {})
+
+        def used(cfg):
+            return {n for key in SECTION_KEYS for n in cfg.get(key, [])}
+
+        old_used = used(old_config)
+        new_used = used(new_config)
+
+        # Modules that are gone or whose own config changed
+        stale = {
+            name for name in old_used
+            if name not in new_used
+            or old_modules.get(name, {}) != new_modules.get(name, {})
+        }
+        started = (new_used - old_used) | (stale & new_used)
+
+        changed_keys = {
+            key for key in set(old_config) | set(new_config)
+            if key not in SECTION_KEYS and key != 'modules'
+            and old_config.get(key) != new_config.get(key)
+        }
+        rebuild_bars = bool(changed_keys - CSS_ONLY_KEYS - LIVE_KEYS)
+
+        c.print_debug(
+            f"Reload diff: restart {sorted(started)}, "
+            f"stop {sorted(stale - new_used)}, "
+            f"changed keys {sorted(changed_keys)}",
+            name='display')
+
+        # Detach widgets for restarted modules before their instances go.
+        if not rebuild_bars:
+            for bar in self.bars.values():
+                for key in SECTION_KEYS:
+                    old_list = old_config.get(key, [])
+                    new_list = new_config.get(key, [])
+                    if old_list != new_list or \
+                            (set(old_list) | set(new_list)) & stale:
+                        bar.clear_section(key)
+        else:
+            for plug in list(self.bars):
+                self._destroy_bar(plug)
+
+        for name in stale:
+            module.remove_instance(name)
+
+        # Swap in the new config everywhere it is read from.
+        old_config.clear()
+        old_config.update(new_config)
+        c.state_manager.update('config', old_config)
+
+        for name in started:
+            module.start_worker(name, old_config['modules'].get(name, {}))
+
+        self.apply_css()
+        c.watchdog.set_budget(
+            old_config.get('stall-budget', DEFAULT_BUDGET_MS))
+
+        if rebuild_bars:
+            self.draw_all()
+        else:
+            for bar in self.bars.values():
+                for key in SECTION_KEYS:
+                    if bar.section_empty(key):
+                        bar.populate_section(key)
+
+    def _destroy_bar(self, plug):
+        """ Tear down the bar on plug, leaving module instances running """
+        bar = self.bars.pop(plug)
+        try:
+            bar.cleanup_modules()
+            bar.window.destroy()
+        except Exception as e:
+            logging.warning("Error destroying bar for %s: %s", plug, e)
+
+    def restart(self):
+        """ Reload by replacing the process image """
+        import module
+        # Signal completion before exec so the settings window
+        # isn't left waiting for a response that will never come.
+        self._signal_reload_done()
         # Stop workers and run cleanup() on all instances so that
         # subprocesses (e.g. nmcli monitor) are terminated before
         # the process image is replaced.
@@ -473,11 +623,16 @@ class Display:
                     len(v) for v in _sm.subscribers.values()
                 )
                 ws_subs = len(_sm.subscribers.get('workspaces', {}))
+                stats = _sm.dispatch_stats()
                 logging.debug(
                     f"Widget instances: {_widget_instance_count}  "
                     f"total subs: {total_subs}  "
                     f"workspaces subs: {ws_subs}  "
-                    f"state keys: {len(_sm.data)}"
+                    f"state keys: {len(_sm.data)}  "
+                    f"updates: {stats['updates']}  "
+                    f"unchanged: {stats['unchanged']}  "
+                    f"coalesced: {stats['coalesced']}  "
+                    f"flushes: {stats['flushes']}"
                 )
 
         return True  # Continue checking
@@ -516,18 +671,33 @@ class Bar:
         right_click.connect('pressed', self._on_right_click)
         self.bar.add_controller(right_click)
 
-    def cleanup_modules(self):
+    def _section(self, section_key):
+        """ Return the box for a config section key """
+        return {
+            'modules-left': self.left,
+            'modules-center': self.center,
+            'modules-right': self.right,
+        }[section_key]
+
+    def cleanup_modules(self, sections=None):
         """ Manually cleanup all modules to prevent leaks """
         count = 0
         widgets_to_cleanup = []
+        if sections is None:
+            sections = [self.left, self.center, self.right]
 
         # First, collect all module widgets
-        for section in [self.left, self.center, self.right]:
+        for section in sections:
             child = section.get_first_child()
             while child:
                 widgets_to_cleanup.append(child)
                 child = child.get_next_sibling()
 
+        # Drop IPC lookups for the widgets going away
+        for name, widget in list(self.module_widgets.items()):
+            if widget in widgets_to_cleanup:
+                del self.module_widgets[name]
+
         # Now cleanup and remove them
         for widget in widgets_to_cleanup:
             # Call cleanup BEFORE removing from parent
@@ -556,32 +726,42 @@ class Bar:
 
         c.print_debug(f"Cleaned up {count} modules")
 
+    def clear_section(self, section_key):
+        """ Remove and clean up every module in one section """
+        self.cleanup_modules([self._section(section_key)])
+
+    def section_empty(self, section_key):
+        """ Return True if a section has no module widgets """
+        return self._section(section_key).get_first_child() is None
+
     def populate(self):
         """ Populate bar with modules """
+        for section_key in ("modules-left", "modules-center",
+                            "modules-right"):
+            self.populate_section(section_key)
+
+    def populate_section(self, section_key):
+        """ Populate one section of the bar with modules """
         # Map config section keys to short names used by zone-snap.
         section_names = {
             "modules-left": "left",
             "modules-center": "center",
             "modules-right": "right",
         }
-        for section_key, section in {
-            "modules-left": self.left,
-            "modules-center": self.center,
-            "modules-right": self.right,
-        }.items():
-            for name in self.config[section_key]:
-                loaded_module = module.module(self, name, self.config)
-                if loaded_module:
-                    # Store section membership so popovers can zone-snap.
-                    loaded_module.section = section_names[section_key]
-                    section.append(loaded_module)
-                    # Track widget by name for IPC lookups
-                    self.module_widgets[name] = loaded_module
-                else:
-                    logging.warning(
-                        f"Module '{name}' could not be loaded and will "
-                        "be skipped."
-                    )
+        section = self._section(section_key)
+        for name in self.config[section_key]:
+            loaded_module = module.module(self, name, self.config)
+            if loaded_module:
+                # Store section membership so popovers can zone-snap.
+                loaded_module.section = section_names[section_key]
+                section.append(loaded_module)
+                # Track widget by name for IPC lookups
+                self.module_widgets[name] = loaded_module
+            else:
+                logging.warning(
+                    f"Module '{name}' could not be loaded and will "
+                    "be skipped."
+                )
 
     def _on_right_click(self, gesture, n_press, x, y):
         """ Handle right-click on bar to show context menu """
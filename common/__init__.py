@@ -22,6 +22,19 @@ from common.helpers import (  # noqa
 # State management
 from common.state import StateManager, state_manager  # noqa
 
+# Write-behind module cache
+from common.cache import CacheWriter, cache_writer  # noqa
+
+# Native compositor IPC clients, shared event bus and workspace model
+from common.compositor import (  # noqa
+    CompositorError, SwayIPC, HyprlandIPC, WorkspaceModel, detect_wm,
+    CompositorBus, compositor,
+)
+
+# Runtime metrics and main-loop stall watchdog
+from common.metrics import Metrics, metrics  # noqa
+from common.watchdog import Watchdog, watchdog  # noqa
+
 # GTK widget classes and factories
 from common.widgets import (  # noqa
     handle_popover_edge,
@@ -36,22 +49,35 @@ from common.widgets import (  # noqa
     Module,
 )
 
-# Cairo drawing widgets
-from common.drawing import (  # noqa
-    Graph,
-    PillBar,
-    HScrollGradientBox,
-    VScrollGradientBox,
-)
+# Deferred import helper for heavy dependencies
+from common.lazy import lazy_import  # noqa
+
+# Cairo drawing widgets, the volume slider, screenshot and font helpers
+# are imported on first use (PEP 562) so consumers that never touch them,
+# like the settings process, don't pay for cairo and friends.
+_LAZY = {
+    'Graph': 'common.drawing',
+    'PillBar': 'common.drawing',
+    'HScrollGradientBox': 'common.drawing',
+    'VScrollGradientBox': 'common.drawing',
+    'VolumeSliderRow': 'common.volume_slider',
+    'capture_widget_to_png': 'common.screenshot',
+    'take_screenshot': 'common.screenshot',
+    'get_resource_path': 'common.fonts',
+    'register_fonts': 'common.fonts',
+}
 
-# Volume slider widget
-from common.volume_slider import VolumeSliderRow  # noqa
 
-# Screenshot utilities
-from common.screenshot import capture_widget_to_png, take_screenshot  # noqa
+def __getattr__(name):
+    """Import a deferred name on first access."""
+    module_name = _LAZY.get(name)
+    if module_name is None:
+        raise AttributeError(f"module 'common' has no attribute '{name}'")
+    import importlib
+    value = getattr(importlib.import_module(module_name), name)
+    globals()[name] = value
+    return value
 
-# Font/resource helpers
-from common.fonts import get_resource_path, register_fonts  # noqa
 
 # BaseModule (imported last to avoid circular imports with module.py)
 from common.base_module import BaseModule  # noqa
@@ -2,12 +2,12 @@
 Description: BaseModule — base class for all data-fetching modules
 Author: thnikk
 """
-import os
-import json
 import time
 import weakref
 from datetime import datetime
 from common.state import state_manager
+from common.cache import cache_writer, DEFAULT_FLUSH_INTERVAL
+from common.metrics import metrics
 from common.helpers import print_debug, add_style
 
 
@@ -15,15 +15,22 @@ class BaseModule:
     """
     Base class providing a standard worker loop with caching and
     state_manager integration.
+
+    Set PERSIST = False for modules with nothing worth restoring on
+    startup, and CACHE_INTERVAL to change how often the cache may be
+    rewritten (seconds). TRANSIENT_FIELDS names payload keys that are
+    never cached, never carried into stale fallbacks, and ignored when
+    deciding whether the payload changed.
     """
+    PERSIST = True
+    CACHE_INTERVAL = DEFAULT_FLUSH_INTERVAL
+    TRANSIENT_FIELDS = ()
 
     def __init__(self, name, config):
         self.name = name
         self.config = config
         module_default = getattr(self.__class__, 'DEFAULT_INTERVAL', None)
         self.interval = config.get('interval', module_default or 60)
-        self.cache_path = os.path.expanduser(
-            f"~/.cache/pybar/{name}.json")
         self.last_data = None
         import module
         resolved_type = module.resolve_type(config.get('type', name))
@@ -34,9 +41,20 @@ class BaseModule:
         )
         self.empty_is_error = getattr(
             self.__class__, 'EMPTY_IS_ERROR', True)
+        self.persist = self.PERSIST and not self.is_hass
         # Single shared subscription; widgets register weak callbacks here.
         self._widget_callbacks = []
         self._state_sub_id = None
+        # Drain order within a batched state dispatch; lower goes first.
+        priority = getattr(self.__class__, 'DISPATCH_PRIORITY', None)
+        if priority is not None:
+            state_manager.set_priority(name, priority)
+        self.transient = frozenset(self.TRANSIENT_FIELDS)
+        if self.transient:
+            state_manager.set_volatile(name, self.transient)
+        # Set by prime() when startup already restored the cache.
+        self._primed = False
+        self._primed_age = None
 
     def cleanup(self):
         """Override in subclass if cleanup is needed."""
@@ -46,115 +64,69 @@ class BaseModule:
         """Override to fetch data; return a dict or None."""
         return {}
 
-    def run_worker(self):
-        """Standard worker loop with caching and stop/wake support."""
-        import module
-        stop_event = module._worker_stop_flags.get(self.name)
-        wake_event = module._worker_wake_flags.get(self.name)
-        first_run = True
+    def _without_transient(self, data):
+        """Return a shallow copy of data minus transient fields."""
+        if not self.transient or not isinstance(data, dict):
+            return data.copy()
+        return {k: v for k, v in data.items() if k not in self.transient}
 
-        while True:
-            data = None
-
-            # Load from cache on first run (non-hass modules only).
-            # If the cache is still fresh (age < interval), skip the
-            # first fetch and sleep out the remaining interval instead.
-            skip_fetch = False
-            sleep_time = None
-            if first_run and not self.is_hass and \
-                    os.path.exists(self.cache_path):
-                try:
-                    with open(self.cache_path, 'r') as f:
-                        cached = json.load(f)
-                    if cached:
-                        self.last_data = cached
-                        stale_init = cached.copy()
-                        cache_age = 0
-                        if 'timestamp' in cached:
-                            cache_age = time.time() - cached['timestamp']
-                            if cache_age > self.interval * 2:
-                                stale_init['stale'] = True
-                        stale_init['timestamp'] = (
-                            datetime.now().timestamp())
-                        state_manager.update(self.name, stale_init)
-                        print_debug(
-                            f"Loaded {self.name} from cache",
-                            color='green')
-                        if cache_age < self.interval:
-                            # Cache is fresh; defer the first real fetch
-                            skip_fetch = True
-                            sleep_time = max(
-                                0, self.interval - cache_age)
-                            print_debug(
-                                f"{self.name} cache is fresh, "
-                                f"skipping first fetch",
-                                color='green')
-                except Exception as e:
-                    print_debug(
-                        f"Failed to load cache for {self.name}: {e}",
-                        color='red')
+    def restore_cache(self, cached):
+        """
+        Publish cached data as the module's initial state.
+
+        Returns the cache age in seconds, or None if there was nothing
+        to restore.
+        """
+        if not cached:
+            return None
+        self.last_data = cached
+        stale_init = cached.copy()
+        cache_age = 0
+        if 'timestamp' in cached:
+            cache_age = time.time() - cached['timestamp']
+            if cache_age > self.interval * 2:
+                stale_init['stale'] = True
+        stale_init['timestamp'] = datetime.now().timestamp()
+        state_manager.update(self.name, stale_init)
+        print_debug(f"Loaded {self.name} from cache", color='green')
+        return cache_age
+
+    def prime(self, cached):
+        """
+        Restore the cache ahead of the first poll.
 
-            start_time = time.time()
+        Called on the GTK thread at startup with the module's entry from
+        the bulk cache load, so the first frame has content and the
+        first poll only needs the cache age.
+        """
+        self._primed = True
+        self._primed_age = None
+        if self.persist:
             try:
-                if not skip_fetch:
-                    new_data = self.fetch_data()
-                    if new_data is not None:
-                        if new_data == {} and self.last_data \
-                                and self.empty_is_error:
-                            # Use stale cache when fetch returns empty
-                            data = self.last_data.copy()
-                            if 'timestamp' in self.last_data:
-                                cache_age = (
-                                    time.time() -
-                                    self.last_data['timestamp'])
-                                if cache_age > self.interval * 2:
-                                    data['stale'] = True
-                            else:
-                                data['stale'] = True
-                            print_debug(
-                                f"{self.name} returned empty, "
-                                f"using stale cache",
-                                color='yellow')
-                        else:
-                            data = new_data
-                            self.last_data = data
-                            if not self.is_hass:
-                                try:
-                                    os.makedirs(
-                                        os.path.dirname(self.cache_path),
-                                        exist_ok=True)
-                                    with open(self.cache_path, 'w') as f:
-                                        json.dump(data, f)
-                                except Exception as e:
-                                    print_debug(
-                                        f"Failed to save cache for "
-                                        f"{self.name}: {e}", color='red')
-                    else:
-                        if self.last_data:
-                            data = self.last_data.copy()
-                            data['stale'] = True
+                self._primed_age = self.restore_cache(cached)
             except Exception as e:
                 print_debug(
-                    f"Worker {self.name} failed: {e}", color='red')
-                if self.last_data:
-                    data = self.last_data.copy()
-                    data['stale'] = True
+                    f"Failed to restore cache for {self.name}: {e}",
+                    color='red')
 
-            execution_time = time.time() - start_time
+    def run_worker(self):
+        """
+        Standalone worker loop with stop/wake support.
 
-            if data is not None:
-                if isinstance(data, dict):
-                    data['timestamp'] = datetime.now().timestamp()
-                state_manager.update(self.name, data)
+        Polling modules are normally driven by the shared scheduler in
+        module.py, which calls poll() directly; this loop is kept for
+        callers that still want a dedicated thread.
+        """
+        import module
+        stop_event = module._worker_stop_flags.get(self.name)
+        wake_event = module._worker_wake_flags.get(self.name)
+        first_run = True
 
+        while True:
+            sleep_time = self.poll(first_run)
             first_run = False
-            if self.interval <= 0:
-                break
-
-            # Use the remaining interval from cache skip, or subtract
-            # the time spent fetching from the full interval.
             if sleep_time is None:
-                sleep_time = max(0, self.interval - execution_time)
+                break
 
             if stop_event:
                 if wake_event:
@@ -169,9 +141,113 @@ class BaseModule:
             else:
                 time.sleep(sleep_time)
 
+    def poll(self, first_run=False):
+        """
+        Run one fetch cycle and publish the result to state_manager.
+
+        Returns the delay in seconds until the next poll, or None if the
+        module should not be polled again.
+        """
+        data = None
+
+        # Load from cache on first run (non-hass modules only), unless
+        # startup already did. If the cache is still fresh (age <
+        # interval), skip the first fetch and sleep out the remaining
+        # interval instead.
+        skip_fetch = False
+        sleep_time = None
+        if first_run and self.persist:
+            try:
+                if self._primed:
+                    # Restored at startup; only the age is needed.
+                    cache_age = self._primed_age
+                    self._primed = False
+                else:
+                    cache_age = self.restore_cache(
+                        cache_writer.load(self.name))
+                if cache_age is not None and cache_age < self.interval:
+                    # Cache is fresh; defer the first real fetch
+                    skip_fetch = True
+                    sleep_time = max(0, self.interval - cache_age)
+                    print_debug(
+                        f"{self.name} cache is fresh, "
+                        f"skipping first fetch",
+                        color='green')
+            except Exception as e:
+                print_debug(
+                    f"Failed to load cache for {self.name}: {e}",
+                    color='red')
+
+        start_time = time.time()
+        fresh = False
+        outcome = 'success'
+        try:
+            if not skip_fetch:
+                new_data = self.fetch_data()
+                if new_data is not None:
+                    if new_data == {} and self.last_data \
+                            and self.empty_is_error:
+                        outcome = 'empty'
+                        # Use stale cache when fetch returns empty
+                        data = self._without_transient(self.last_data)
+                        if 'timestamp' in self.last_data:
+                            cache_age = (
+                                time.time() -
+                                self.last_data['timestamp'])
+                            if cache_age > self.interval * 2:
+                                data['stale'] = True
+                        else:
+                            data['stale'] = True
+                        print_debug(
+                            f"{self.name} returned empty, "
+                            f"using stale cache",
+                            color='yellow')
+                    else:
+                        data = new_data
+                        self.last_data = data
+                        fresh = True
+                else:
+                    outcome = 'stale'
+                    if self.last_data:
+                        data = self._without_transient(self.last_data)
+                        data['stale'] = True
+        except Exception as e:
+            outcome = 'exception'
+            print_debug(
+                f"Worker {self.name} failed: {e}", color='red')
+            if self.last_data:
+                data = self._without_transient(self.last_data)
+                data['stale'] = True
+
+        execution_time = time.time() - start_time
+        if not skip_fetch:
+            metrics.record_fetch(self.name, outcome, execution_time)
+
+        if data is not None:
+            if isinstance(data, dict):
+                data['timestamp'] = datetime.now().timestamp()
+            state_manager.update(self.name, data)
+            if fresh and self.persist:
+                cache_writer.save(
+                    self.name, self._without_transient(data),
+                    self.CACHE_INTERVAL)
+
+        if self.interval <= 0:
+            return None
+
+        # Use the remaining interval from cache skip, or subtract
+        # the time spent fetching from the full interval.
+        if sleep_time is None:
+            sleep_time = max(0, self.interval - execution_time)
+        return sleep_time
+
     def _ensure_subscription(self):
         """Register one shared state subscription for all widgets."""
         if self._state_sub_id is not None:
+            # A widget built after the first delivery (hotplug, in-place
+            # reload) needs the current value replayed, since unchanged
+            # payloads are never dispatched again.
+            state_manager.resend(self._state_sub_id)
             return
 
         def _fan_out(data):
@@ -0,0 +1,357 @@
+"""
+Description: Consolidated write-behind store for module caches
+Author: thnikk
+"""
+import os
+import json
+import time
+import threading
+from common.helpers import print_debug
+
+CACHE_DIR = os.path.expanduser('~/.cache/pybar')
+STORE_PATH = os.path.join(CACHE_DIR, 'cache.db')
+
+# Default minimum seconds between two writes of the same cache entry.
+DEFAULT_FLUSH_INTERVAL = 60
+
+# Rewrite the log once it is this many times larger than its live
+# records, but never bother below COMPACT_MIN_BYTES.
+COMPACT_RATIO = 4
+COMPACT_MIN_BYTES = 256 * 1024
+
+# Legacy ~/.cache/pybar/*.json caches that aren't named after a module.
+# Other JSON files there (config, startup trace, module manifest) are
+# left alone.
+_LEGACY_NAMES = {'clock_events'}
+_LEGACY_SUFFIX = '_pin'
+
+
+def _encode(name, data):
+    """Return one log record: name, a tab, compact JSON, newline."""
+    key = name.replace('\t', ' ').replace('\n', ' ')
+    payload = json.dumps(data, separators=(',', ':'), default=repr)
+    return f"{key}\t{payload}\n".encode('utf-8')
+
+
+class CacheWriter:
+    """
+    Append-only log holding every module cache in one file.
+
+    Each record is "<name>\\t<json>\\n"; the last record for a name wins
+    and a null payload deletes it. open() scans the file once and keeps
+    an index of record offsets, so reads are a single seek and parse.
+    save() only marks an entry dirty; one background thread appends it
+    at most once per flush interval, and flush_all() writes everything
+    pending on shutdown. The log is compacted by atomic rename once it
+    grows well past its live size.
+    """
+
+    def __init__(self, path=STORE_PATH):
+        self.path = path
+        self._cond = threading.Condition()
+        # Serializes file writes between the flush thread and flush_all.
+        self._io_lock = threading.Lock()
+        # name -> (offset, length) of the latest record on disk
+        self._index = {}
+        self._file_size = 0
+        self._opened = False
+        # name -> {'data', 'interval', 'dirty', 'written'}
+        self._entries = {}
+        self._thread = None
+        # Set by close(); later saves are written immediately.
+        self._closed = False
+
+    # ------------------------------------------------------------------
+    # Reading
+    # ------------------------------------------------------------------
+
+    def open(self, module_names=()):
+        """
+        Scan the store once and build the index. If it doesn't exist
+        yet, the legacy cache files of module_names are migrated.
+        """
+        with self._io_lock:
+            if self._opened:
+                return
+            self._opened = True
+            if not os.path.exists(self.path):
+                self._migrate_legacy(module_names)
+                return
+            self._scan()
+
+    def _scan(self):
+        """Index every record in the log; caller holds _io_lock."""
+        index = {}
+        offset = 0
+        # End of the last complete record
+        end = 0
+        try:
+            with open(self.path, 'rb') as f:
+                for line in f:
+                    length = len(line)
+                    if line.endswith(b'\n'):
+                        name, _, payload = line.partition(b'\t')
+                        key = name.decode('utf-8', 'replace')
+                        if payload.strip() == b'null':
+                            index.pop(key, None)
+                        else:
+                            index[key] = (offset, length)
+                        end = offset + length
+                    offset += length
+        except OSError as e:
+            print_debug(f"Failed to read cache store: {e}", color='red')
+        if end < offset:
+            # Cut off a torn final record (no newline) so the next
+            # append doesn't run into it.
+            try:
+                os.truncate(self.path, end)
+            except OSError as e:
+                print_debug(
+                    f"Failed to repair cache store: {e}", color='red')
+        self._index = index
+        self._file_size = end
+
+    def _read_record(self, name):
+        """Parse the on-disk record for name, or return None."""
+        loc = self._index.get(name)
+        if loc is None:
+            return None
+        offset, length = loc
+        with open(self.path, 'rb') as f:
+            f.seek(offset)
+            line = f.read(length)
+        return json.loads(line.partition(b'\t')[2])
+
+    def load(self, name):
+        """Return the cached data for name, or None."""
+        self.open()
+        with self._cond:
+            entry = self._entries.get(name)
+            if entry is not None:
+                return entry['data']
+        with self._io_lock:
+            try:
+                return self._read_record(name)
+            except (OSError, ValueError) as e:
+                print_debug(
+                    f"Failed to load cache for {name}: {e}", color='red')
+                return None
+
+    def load_all(self, module_names=()):
+        """
+        Return {name: data} for every cached entry in one file read.
+        module_names are passed on to open() for migration.
+        """
+        self.open(module_names)
+        result = {}
+        with self._io_lock:
+            try:
+                with open(self.path, 'rb') as f:
+                    blob = f.read()
+            except OSError:
+                blob = b''
+            for name, (offset, length) in self._index.items():
+                record = blob[offset:offset + length]
+                try:
+                    result[name] = json.loads(record.partition(b'\t')[2])
+                except ValueError:
+                    continue
+        with self._cond:
+            for name, entry in self._entries.items():
+                result[name] = entry['data']
+        return result
+
+    def _migrate_legacy(self, module_names):
+        """Fold old per-module ~/.cache/pybar/*.json files into the store."""
+        cache_dir = os.path.dirname(self.path)
+        if not os.path.isdir(cache_dir):
+            return
+        names = set(module_names) | _LEGACY_NAMES
+        records = []
+        migrated = []
+        for entry in os.scandir(cache_dir):
+            if not entry.is_file() or not entry.name.endswith('.json'):
+                continue
+            stem = entry.name[:-5]
+            if stem not in names and not stem.endswith(_LEGACY_SUFFIX):
+                continue
+            try:
+                with open(entry.path, 'r') as f:
+                    data = json.load(f)
+            except (OSError, ValueError):
+                continue
+            records.append(_encode(stem, data))
+            migrated.append(entry.path)
+        if not records:
+            return
+        try:
+            self._write_log(records)
+        except OSError as e:
+            print_debug(f"Failed to migrate caches: {e}", color='red')
+            return
+        for path in migrated:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+        print_debug(
+            f"Migrated {len(migrated)} cache files into {self.path}",
+            color='green')
+
+    # ------------------------------------------------------------------
+    # Writing
+    # ------------------------------------------------------------------
+
+    def _write_log(self, records):
+        """Atomically replace the log with records and reindex."""
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'wb') as f:
+            for record in records:
+                f.write(record)
+        os.replace(tmp_path, self.path)
+        self._scan()
+
+    def _append(self, jobs):
+        """Append records for jobs, compacting if the log has bloated."""
+        self.open()
+        with self._io_lock:
+            try:
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+                with open(self.path, 'ab') as f:
+                    for name, data in jobs:
+                        record = _encode(name, data)
+                        f.write(record)
+                        if data is None:
+                            self._index.pop(name, None)
+                        else:
+                            self._index[name] = (
+                                self._file_size, len(record))
+                        self._file_size += len(record)
+            except (OSError, TypeError, ValueError) as e:
+                print_debug(f"Failed to save cache: {e}", color='red')
+                return
+            live = sum(length for _, length in self._index.values())
+            if self._file_size > max(
+                    COMPACT_MIN_BYTES, live * COMPACT_RATIO):
+                self._compact()
+
+    def _compact(self):
+        """Rewrite the log with only live records; caller holds _io_lock."""
+        records = []
+        try:
+            with open(self.path, 'rb') as f:
+                for offset, length in sorted(self._index.values()):
+                    f.seek(offset)
+                    records.append(f.read(length))
+            self._write_log(records)
+        except OSError as e:
+            print_debug(f"Failed to compact cache: {e}", color='red')
+
+    def _ensure_started(self):
+        """Start the flush thread on first use."""
+        if self._thread is None:
+            self._thread = threading.Thread(
+                target=self._flush_loop, name='pybar-cache', daemon=True)
+            self._thread.start()
+
+    def save(self, name, data, interval=DEFAULT_FLUSH_INTERVAL):
+        """Mark a cache entry dirty; it is written in the background."""
+        with self._cond:
+            entry = self._entries.get(name)
+            if entry is None:
+                entry = self._entries[name] = {'written': 0}
+            entry['data'] = data
+            entry['interval'] = interval
+            closed = self._closed
+            entry['dirty'] = not closed
+            if not closed:
+                self._ensure_started()
+                self._cond.notify()
+        if closed:
+            self._append([(name, data)])
+
+    def delete(self, name):
+        """Remove an entry from the store."""
+        self.save(name, None, interval=0)
+
+    def _due(self, now):
+        """Return (due entry names, seconds until the next due entry)."""
+        due = []
+        wait = None
+        for name, entry in self._entries.items():
+            if not entry['dirty']:
+                continue
+            remaining = entry['written'] + entry['interval'] - now
+            if remaining <= 0:
+                due.append(name)
+            elif wait is None or remaining < wait:
+                wait = remaining
+        return due, wait
+
+    def _take(self, names):
+        """Clear the dirty flag on names and return their write jobs."""
+        jobs = []
+        now = time.monotonic()
+        for name in names:
+            entry = self._entries[name]
+            entry['dirty'] = False
+            entry['written'] = now
+            jobs.append((name, entry['data']))
+        return jobs
+
+    def _flush_loop(self):
+        """Append entries as their flush intervals elapse."""
+        while True:
+            with self._cond:
+                due, wait = self._due(time.monotonic())
+                while not due:
+                    self._cond.wait(wait)
+                    due, wait = self._due(time.monotonic())
+                jobs = self._take(due)
+            self._append(jobs)
+
+    def flush_all(self):
+        """Write every dirty entry now."""
+        with self._cond:
+            jobs = self._take(
+                [n for n, e in self._entries.items() if e['dirty']])
+        if jobs:
+            self._append(jobs)
+
+    def close(self):
+        """Flush everything and write any later save() straight through."""
+        with self._cond:
+            self._closed = True
+        self.flush_all()
+
+    # ------------------------------------------------------------------
+    # Introspection
+    # ------------------------------------------------------------------
+
+    def sizes(self):
+        """Return on-disk record size in bytes per entry."""
+        self.open()
+        with self._io_lock:
+            return {
+                name: length for name, (_, length) in self._index.items()
+            }
+
+    def debug_info(self):
+        """Return store size and the number of tracked/dirty entries."""
+        self.open()
+        with self._cond:
+            dirty = sum(e['dirty'] for e in self._entries.values())
+        with self._io_lock:
+            return {
+                'path': self.path,
+                'file_bytes': self._file_size,
+                'live_bytes': sum(
+                    length for _, length in self._index.values()),
+                'entries': len(self._index),
+                'dirty': dirty,
+            }
+
+
+# Module-level singleton
+cache_writer = CacheWriter()
@@ -0,0 +1,574 @@
+"""
+Description: Native Sway (i3 IPC) and Hyprland socket clients, a shared
+             compositor event bus and an incrementally updated
+             workspace model
+Author: thnikk
+"""
+import os
+import json
+import time
+import socket
+import struct
+import threading
+from common.helpers import print_debug
+
+# i3/Sway message types
+SWAY_RUN_COMMAND = 0
+SWAY_GET_WORKSPACES = 1
+SWAY_SUBSCRIBE = 2
+SWAY_GET_OUTPUTS = 3
+SWAY_GET_VERSION = 7
+SWAY_GET_BINDING_STATE = 12
+# Event types have the high bit set.
+SWAY_EVENT_TYPES = {
+    'workspace': 0x80000000,
+    'output': 0x80000001,
+    'mode': 0x80000002,
+    'window': 0x80000003,
+    'barconfig_update': 0x80000004,
+    'binding': 0x80000005,
+    'shutdown': 0x80000006,
+    'tick': 0x80000007,
+    'bar_state_update': 0x80000014,
+    'input': 0x80000015,
+}
+SWAY_EVENT_NAMES = {v: k for k, v in SWAY_EVENT_TYPES.items()}
+
+RECV_SIZE = 65536
+# Seconds to wait before reconnecting a dropped event stream.
+RECONNECT_DELAY = 5
+
+
+class CompositorError(Exception):
+    """The compositor socket is missing, closed or sent garbage."""
+
+
+def _recv_exact(sock, size):
+    """Read exactly size bytes or raise CompositorError on EOF."""
+    buf = bytearray()
+    while len(buf) < size:
+        chunk = sock.recv(size - len(buf))
+        if not chunk:
+            raise CompositorError('Connection closed by compositor')
+        buf += chunk
+    return bytes(buf)
+
+
+class SwayIPC:
+    """
+    Client for the i3/Sway binary IPC protocol.
+
+    Requests share one persistent connection guarded by a lock, so they
+    can be made from any thread. events() opens a second connection,
+    since a subscribed socket only carries events.
+    """
+
+    MAGIC = b'i3-ipc'
+    _HEADER = struct.Struct('=6sII')
+
+    def __init__(self, path=None):
+        self.path = path or os.getenv('SWAYSOCK') or os.getenv('I3SOCK')
+        self._sock = None
+        self._lock = threading.Lock()
+        self._event_sock = None
+        self._event_lock = threading.Lock()
+
+    def _connect(self):
+        """Open a connection to the IPC socket."""
+        if not self.path:
+            raise CompositorError('SWAYSOCK is not set')
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            sock.connect(self.path)
+        except OSError as e:
+            sock.close()
+            raise CompositorError(f'Failed to connect to sway: {e}') from e
+        return sock
+
+    def _send(self, sock, msg_type, payload=''):
+        """Write one framed message."""
+        body = payload.encode() if isinstance(payload, str) else payload
+        sock.sendall(
+            self._HEADER.pack(self.MAGIC, len(body), msg_type) + body)
+
+    def _recv(self, sock):
+        """Read one framed message; returns (type, decoded JSON)."""
+        magic, length, msg_type = self._HEADER.unpack(
+            _recv_exact(sock, self._HEADER.size))
+        if magic != self.MAGIC:
+            raise CompositorError('Bad i3-ipc magic')
+        try:
+            return msg_type, json.loads(_recv_exact(sock, length))
+        except ValueError as e:
+            raise CompositorError(f'Bad i3-ipc payload: {e}') from e
+
+    def request(self, msg_type, payload=''):
+        """Send a request and return its reply, reconnecting once."""
+        with self._lock:
+            for attempt in (0, 1):
+                if self._sock is None:
+                    self._sock = self._connect()
+                try:
+                    self._send(self._sock, msg_type, payload)
+                    reply_type, reply = self._recv(self._sock)
+                    if reply_type == msg_type:
+                        return reply
+                    raise CompositorError(
+                        f'Unexpected reply type {reply_type}')
+                except (OSError, CompositorError):
+                    self._close()
+                    if attempt:
+                        raise
+        return None
+
+    def command(self, cmd):
+        """Run a sway command, e.g. 'workspace number 3'."""
+        return self.request(SWAY_RUN_COMMAND, cmd)
+
+    def get_workspaces(self):
+        """Return the GET_WORKSPACES reply."""
+        return self.request(SWAY_GET_WORKSPACES)
+
+    def get_binding_state(self):
+        """Return the GET_BINDING_STATE reply, e.g. {'name': 'default'}."""
+        return self.request(SWAY_GET_BINDING_STATE)
+
+    def events(self, names):
+        """
+        Subscribe to event names ('workspace', 'mode', 'output', ...)
+        and yield (name, payload) until the connection drops, which
+        raises CompositorError. ('connected', None) is yielded first,
+        once the subscription is in place.
+        """
+        sock = self._connect()
+        try:
+            self._send(sock, SWAY_SUBSCRIBE, json.dumps(sorted(names)))
+            msg_type, reply = self._recv(sock)
+            if msg_type != SWAY_SUBSCRIBE or not reply.get('success'):
+                raise CompositorError(f'Subscribe failed: {reply}')
+            with self._event_lock:
+                self._event_sock = sock
+            yield 'connected', None
+            while True:
+                msg_type, payload = self._recv(sock)
+                if msg_type == SWAY_SUBSCRIBE:
+                    # Reply to a later add_events().
+                    continue
+                name = SWAY_EVENT_NAMES.get(
+                    msg_type, f'0x{msg_type:08x}')
+                yield name, payload
+        except OSError as e:
+            raise CompositorError(f'Sway event stream failed: {e}') from e
+        finally:
+            with self._event_lock:
+                if self._event_sock is sock:
+                    self._event_sock = None
+            sock.close()
+
+    def add_events(self, names):
+        """
+        Subscribe the open event stream to more event names. Returns
+        False if no stream is open; the names then need to be passed to
+        the next events() call.
+        """
+        with self._event_lock:
+            if self._event_sock is None:
+                return False
+            try:
+                self._send(
+                    self._event_sock, SWAY_SUBSCRIBE,
+                    json.dumps(sorted(names)))
+            except OSError:
+                return False
+        return True
+
+    def _close(self):
+        """Drop the request connection; caller holds the lock."""
+        if self._sock is not None:
+            try:
+                self._sock.close()
+            except OSError:
+                pass
+            self._sock = None
+
+    def close(self):
+        """Close the request connection."""
+        with self._lock:
+            self._close()
+
+
+class HyprlandIPC:
+    """
+    Client for Hyprland's request socket (socket1) and event socket
+    (socket2).
+
+    Hyprland answers exactly one request per socket1 connection and then
+    closes it, so each request is a short connect/send/read in-process.
+    Events arrive as newline-terminated 'EVENT>>DATA' lines on a single
+    persistent socket2 connection.
+    """
+
+    def __init__(self, signature=None):
+        signature = signature or os.getenv('HYPRLAND_INSTANCE_SIGNATURE')
+        self.directory = None
+        if signature:
+            for base in (os.getenv('XDG_RUNTIME_DIR'), '/tmp'):
+                if not base:
+                    continue
+                path = os.path.join(base, 'hypr', signature)
+                if os.path.exists(os.path.join(path, '.socket.sock')):
+                    self.directory = path
+                    break
+
+    def _connect(self, name):
+        """Connect to one of the instance sockets."""
+        if not self.directory:
+            raise CompositorError('Hyprland instance socket not found')
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            sock.connect(os.path.join(self.directory, name))
+        except OSError as e:
+            sock.close()
+            raise CompositorError(
+                f'Failed to connect to Hyprland: {e}') from e
+        return sock
+
+    def request(self, command, as_json=True):
+        """
+        Send a socket1 request such as 'workspaces' and return the
+        reply, decoded from JSON unless as_json is False.
+        """
+        with self._connect('.socket.sock') as sock:
+            try:
+                sock.sendall(
+                    (f'j/{command}' if as_json else command).encode())
+                chunks = []
+                while True:
+                    chunk = sock.recv(RECV_SIZE)
+                    if not chunk:
+                        break
+                    chunks.append(chunk)
+            except OSError as e:
+                raise CompositorError(
+                    f'Hyprland request failed: {e}') from e
+        raw = b''.join(chunks).decode('utf-8', 'replace')
+        if not as_json:
+            return raw.strip()
+        try:
+            return json.loads(raw)
+        except ValueError as e:
+            raise CompositorError(f'Bad Hyprland reply: {e}') from e
+
+    def command(self, cmd):
+        """Run a dispatcher, e.g. 'workspace 3'."""
+        return self.request(f'dispatch {cmd}', as_json=False)
+
+    def events(self):
+        """
+        Yield (event, data) from socket2 until the connection drops,
+        which raises CompositorError. ('connected', None) is yielded
+        first, once the socket is open.
+        """
+        sock = self._connect('.socket2.sock')
+        buf = bytearray()
+        try:
+            yield 'connected', None
+            while True:
+                chunk = sock.recv(RECV_SIZE)
+                if not chunk:
+                    raise CompositorError('Connection closed by Hyprland')
+                buf += chunk
+                while True:
+                    newline = buf.find(b'\n')
+                    if newline < 0:
+                        break
+                    line = bytes(buf[:newline]).decode('utf-8', 'replace')
+                    del buf[:newline + 1]
+                    event, sep, data = line.partition('>>')
+                    if sep:
+                        yield event, data
+        except OSError as e:
+            raise CompositorError(
+                f'Hyprland event stream failed: {e}') from e
+        finally:
+            sock.close()
+
+
+def detect_wm():
+    """Return 'sway', 'hyprland' or None from the session environment."""
+    if os.getenv('HYPRLAND_INSTANCE_SIGNATURE'):
+        return 'hyprland'
+    if os.getenv('SWAYSOCK') or os.getenv('I3SOCK'):
+        return 'sway'
+    return None
+
+
+class CompositorBus:
+    """
+    The compositor connection shared by every module.
+
+    The window manager is detected once, and a single thread holds the
+    only event stream (a Sway subscription or Hyprland's socket2),
+    fanning events out to subscribers. Callbacks run one at a time on
+    that thread as callback(event, payload), so they must not block.
+    After every (re)connect, and straight away for a subscriber joining
+    a live stream, each subscriber gets ('connected', None) and should
+    resync its state with a request.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # Serializes callbacks between the bus thread and subscribe().
+        self._dispatch_lock = threading.RLock()
+        self._wm = None
+        self._client = None
+        self._detected = False
+        self._subscribers = {}
+        self._next_id = 0
+        self._thread = None
+        self.connected = False
+
+    def _detect(self):
+        """Detect the window manager and create its client once."""
+        with self._lock:
+            if not self._detected:
+                self._wm = detect_wm()
+                if self._wm == 'sway':
+                    self._client = SwayIPC()
+                elif self._wm == 'hyprland':
+                    self._client = HyprlandIPC()
+                self._detected = True
+
+    @property
+    def wm(self):
+        """'sway', 'hyprland', or None if neither is running."""
+        self._detect()
+        return self._wm
+
+    @property
+    def client(self):
+        """The SwayIPC or HyprlandIPC request client, or None."""
+        self._detect()
+        return self._client
+
+    def _sway_events(self):
+        """Return the Sway event names subscribers want; caller locks."""
+        names = set()
+        for _, events in self._subscribers.values():
+            names |= events & SWAY_EVENT_TYPES.keys()
+        return names
+
+    def subscribe(self, callback, events):
+        """
+        Call callback(event, payload) for the named events, given in
+        the running compositor's terms ('workspace', 'mode', 'submap',
+        ...; names the other compositor uses are ignored). Returns an
+        ID for unsubscribe().
+        """
+        client = self.client
+        events = frozenset(events)
+        with self._lock:
+            self._next_id += 1
+            sub_id = self._next_id
+            if self._wm == 'sway':
+                new = events & SWAY_EVENT_TYPES.keys() - self._sway_events()
+            else:
+                new = ()
+            self._subscribers[sub_id] = (callback, events)
+            start = client is not None and self._thread is None
+            if start:
+                self._thread = threading.Thread(
+                    target=self._run, name='pybar-compositor', daemon=True)
+        if start:
+            self._thread.start()
+        elif new:
+            # Without an open stream this does nothing; _run subscribes
+            # to every wanted name when it connects.
+            client.add_events(new)
+        with self._dispatch_lock:
+            if self.connected and sub_id in self._subscribers:
+                self._call(callback, 'connected', None)
+        return sub_id
+
+    def unsubscribe(self, sub_id):
+        """Stop delivering events to a subscriber."""
+        with self._lock:
+            return self._subscribers.pop(sub_id, None) is not None
+
+    def _call(self, callback, event, payload):
+        """Run one callback, logging failures."""
+        try:
+            callback(event, payload)
+        except Exception as e:
+            print_debug(
+                f"Compositor event handler failed for {event}: {e}",
+                name='compositor', color='red')
+
+    def _dispatch(self, event, payload):
+        """Deliver an event to every subscriber that wants it."""
+        with self._lock:
+            targets = [
+                callback for callback, events in self._subscribers.values()
+                if event == 'connected' or event in events
+            ]
+        with self._dispatch_lock:
+            if event == 'connected':
+                self.connected = True
+            for callback in targets:
+                self._call(callback, event, payload)
+
+    def _run(self):
+        """Follow the event stream, reconnecting when it drops."""
+        client = self._client
+        while True:
+            try:
+                if self._wm == 'sway':
+                    with self._lock:
+                        names = self._sway_events()
+                    stream = client.events(names)
+                else:
+                    stream = client.events()
+                for event, payload in stream:
+                    if event == 'connected' and self._wm == 'sway':
+                        # Names wanted by subscribers that joined while
+                        # the connection was being set up.
+                        with self._lock:
+                            missing = self._sway_events() - names
+                        if missing:
+                            client.add_events(missing)
+                    self._dispatch(event, payload)
+            except CompositorError as e:
+                print_debug(
+                    f"Compositor event stream error: {e}",
+                    name='compositor', color='red')
+            with self._dispatch_lock:
+                self.connected = False
+            time.sleep(RECONNECT_DELAY)
+
+
+class WorkspaceModel:
+    """
+    Workspaces, their outputs, and which are visible and focused.
+
+    Loaded from a full query with reset(), then kept current from
+    compositor events. apply_sway() and apply_hyprland() return True if
+    the model changed, False if it didn't, and None when the event
+    can't be applied incrementally and the caller should reset() from a
+    fresh query.
+    """
+
+    def __init__(self):
+        self.outputs = {}
+        self.visible = set()
+        self.focused = None
+        self.focused_output = None
+
+    def reset(self, outputs, visible, focused, focused_output=None):
+        """Replace the model with queried state."""
+        self.outputs = dict(outputs)
+        self.visible = set(visible)
+        self.focused = focused
+        self.focused_output = focused_output or outputs.get(focused)
+
+    def reset_sway(self, workspaces):
+        """Reset from a sway GET_WORKSPACES reply."""
+        focused = next(
+            (w['name'] for w in workspaces if w.get('focused')), None)
+        self.reset(
+            {w['name']: w['output'] for w in workspaces},
+            [w['name'] for w in workspaces if w.get('visible')],
+            focused)
+
+    def reset_hyprland(self, workspaces, monitors):
+        """Reset from Hyprland 'workspaces' and 'monitors' replies."""
+        focused_monitor = next(
+            (m for m in monitors if m.get('focused')), None)
+        self.reset(
+            {str(w['name']): w['monitor'] for w in workspaces},
+            [str(m['activeWorkspace']['name']) for m in monitors],
+            str(focused_monitor['activeWorkspace']['name'])
+            if focused_monitor else None,
+            focused_monitor['name'] if focused_monitor else None)
+
+    def _show(self, name, output):
+        """Make name the visible workspace on output."""
+        self.visible = {
+            w for w in self.visible if self.outputs.get(w) != output}
+        self.outputs[name] = output
+        self.visible.add(name)
+
+    def apply_sway(self, event):
+        """Apply a sway workspace event."""
+        change = event.get('change')
+        current = event.get('current') or {}
+        name = current.get('name')
+        if change == 'urgent':
+            return False
+        if change not in ('init', 'empty', 'focus') or name is None:
+            # move, rename and reload touch several workspaces at once.
+            return None
+        before = self._state()
+        if change == 'init':
+            self.outputs[name] = current.get('output')
+            if current.get('visible'):
+                self._show(name, current.get('output'))
+        elif change == 'empty':
+            self.outputs.pop(name, None)
+            self.visible.discard(name)
+            if self.focused == name:
+                self.focused = None
+        else:
+            output = current.get('output')
+            self._show(name, output)
+            self.focused = name
+            self.focused_output = output
+        return self._state() != before
+
+    def apply_hyprland(self, event, data):
+        """Apply a Hyprland socket2 event."""
+        before = self._state()
+        if event == 'workspace':
+            output = self.outputs.get(data, self.focused_output)
+            self._show(data, output)
+            self.focused = data
+            self.focused_output = output
+        elif event == 'focusedmon':
+            monitor, _, name = data.partition(',')
+            self.focused_output = monitor
+            self.focused = name
+            self._show(name, monitor)
+        elif event == 'createworkspace':
+            self.outputs.setdefault(data, self.focused_output)
+        elif event == 'destroyworkspace':
+            self.outputs.pop(data, None)
+            self.visible.discard(data)
+        elif event in ('moveworkspace', 'renameworkspace',
+                       'monitoradded', 'monitorremoved'):
+            return None
+        else:
+            return False
+        return self._state() != before
+
+    def _state(self):
+        """Return a comparable copy of everything snapshot() reports."""
+        return (dict(self.outputs), frozenset(self.visible), self.focused)
+
+    def snapshot(self):
+        """Return the state in the workspaces module's data format."""
+        outputs = sorted(
+            {o for o in self.outputs.values() if o is not None},
+            key=lambda x: x.lower())
+        return {
+            'workspaces': sorted(self.outputs),
+            'focused': self.focused,
+            'monitors': {
+                name: str(outputs.index(output) + 1)
+                for name, output in self.outputs.items()
+                if output is not None
+            },
+            'visible': sorted(self.visible),
+        }
+
+
+# Module-level singleton
+compositor = CompositorBus()
@@ -0,0 +1,53 @@
+"""
+Description: Deferred imports for heavy optional dependencies
+Author: thnikk
+"""
+import sys
+import types
+import importlib
+import importlib.util
+import threading
+
+
+class _LazyModule(types.ModuleType):
+    """Module stand-in that imports the real module on first use."""
+
+    def __init__(self, name):
+        super().__init__(name)
+        self._lazy_lock = threading.Lock()
+        self._lazy_module = None
+
+    def _load(self):
+        """Import the real module once, even if threads race here."""
+        module = self._lazy_module
+        if module is None:
+            with self._lazy_lock:
+                if self._lazy_module is None:
+                    self._lazy_module = importlib.import_module(
+                        self.__name__)
+                module = self._lazy_module
+        return module
+
+    def __getattr__(self, attr):
+        return getattr(self._load(), attr)
+
+    def __dir__(self):
+        return dir(self._load())
+
+
+def lazy_import(name):
+    """
+    Return a module whose import is deferred until an attribute is used.
+
+    Modules call this at the top level for heavy dependencies, such as
+    psutil or requests. Importing the module file is then cheap, and the
+    real import happens on the worker thread that first uses it, not on
+    the GTK thread during startup. A missing package is still reported
+    immediately, because the module spec is looked up here.
+    """
+    module = sys.modules.get(name)
+    if module is not None:
+        return module
+    if importlib.util.find_spec(name) is None:
+        raise ModuleNotFoundError(f"No module named '{name}'", name=name)
+    return _LazyModule(name)
@@ -0,0 +1,241 @@
+"""
+Description: Cached manifest of module types, aliases and schemas
+Author: thnikk
+"""
+import os
+import ast
+import json
+import threading
+from common.helpers import print_debug
+
+MANIFEST_PATH = os.path.expanduser('~/.cache/pybar/modules-manifest.json')
+
+# Bump when the entry layout changes so old caches are rebuilt.
+MANIFEST_VERSION = 1
+
+_BASE_CLASSES = {'BaseModule', 'c.BaseModule'}
+
+
+def _str_dict(node):
+    """Return {str: class name} for a dict literal of names, or None."""
+    if not isinstance(node, ast.Dict):
+        return None
+    result = {}
+    for key, value in zip(node.keys, node.values):
+        if not isinstance(key, ast.Constant) or \
+                not isinstance(key.value, str) or \
+                not isinstance(value, ast.Name):
+            return None
+        result[key.value] = value.id
+    return result
+
+
+def _class_schema(name, classes, seen=None):
+    """
+    Return the SCHEMA a class defines or inherits within its file, {} if
+    it only inherits BaseModule's, or None if it can't be read
+    statically.
+    """
+    seen = seen or set()
+    node = classes.get(name)
+    if node is None or name in seen:
+        return None
+    seen.add(name)
+    for stmt in node.body:
+        if isinstance(stmt, ast.Assign) and any(
+                isinstance(t, ast.Name) and t.id == 'SCHEMA'
+                for t in stmt.targets):
+            try:
+                return ast.literal_eval(stmt.value)
+            except ValueError:
+                return None
+    for base in node.bases:
+        base_name = ast.unparse(base)
+        if base_name in _BASE_CLASSES:
+            continue
+        schema = _class_schema(base_name, classes, seen)
+        if schema:
+            return schema
+        if schema is None:
+            return None
+    return {}
+
+
+def scan_file(path):
+    """
+    Extract module_map, alias_map and per-class SCHEMA from a module
+    file without importing it. The entry is marked dynamic when any of
+    them aren't plain literals, in which case the file must be imported
+    to learn them.
+    """
+    with open(path, 'r') as f:
+        tree = ast.parse(f.read(), path)
+    classes = {
+        node.name: node for node in tree.body
+        if isinstance(node, ast.ClassDef)
+    }
+    maps = {'module_map': {}, 'alias_map': {}}
+    dynamic = False
+    for node in tree.body:
+        if not isinstance(node, ast.Assign):
+            continue
+        for target in node.targets:
+            if isinstance(target, ast.Name) and target.id in maps:
+                parsed = _str_dict(node.value)
+                if parsed is None:
+                    dynamic = True
+                else:
+                    maps[target.id] = parsed
+    schemas = {}
+    for cls in set(maps['module_map'].values()) | \
+            set(maps['alias_map'].values()):
+        schema = _class_schema(cls, classes)
+        if schema is None:
+            dynamic = True
+        else:
+            schemas[cls] = schema
+    try:
+        json.dumps(schemas)
+    except (TypeError, ValueError):
+        schemas = {}
+        dynamic = True
+    return {
+        'types': maps['module_map'],
+        'aliases': maps['alias_map'],
+        'schemas': schemas,
+        'dynamic': dynamic,
+    }
+
+
+class Manifest:
+    """
+    What every file in modules/ provides, read from source with ast.
+
+    Entries are cached in ~/.cache/pybar and rescanned only when a
+    file's mtime or size changes, so resolving a type, alias or schema
+    never imports a module the config doesn't use.
+    """
+
+    def __init__(self, path=MANIFEST_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._entries = None
+        self._types = {}
+        self._canonical = {}
+
+    def _read_cache(self):
+        """Return cached entries, or {} if missing or outdated."""
+        try:
+            with open(self.path, 'r') as f:
+                cached = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        if cached.get('version') != MANIFEST_VERSION:
+            return {}
+        return cached.get('files', {})
+
+    def _write_cache(self, entries):
+        """Atomically replace the cached manifest."""
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, 'w') as f:
+                json.dump({
+                    'version': MANIFEST_VERSION, 'files': entries}, f)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            print_debug(f"Failed to save module manifest: {e}", color='red')
+
+    def load(self, modules_dir):
+        """Build the manifest for modules_dir, rescanning changed files."""
+        with self._lock:
+            if self._entries is not None:
+                return
+            cached = self._read_cache()
+            entries = {}
+            changed = False
+            try:
+                files = [
+                    e for e in os.scandir(modules_dir)
+                    if e.name.endswith('.py') and e.name != '__init__.py'
+                ]
+            except OSError:
+                files = []
+            for entry in files:
+                name = entry.name[:-3]
+                stat = entry.stat()
+                old = cached.get(name)
+                if old and old.get('mtime') == stat.st_mtime_ns \
+                        and old.get('size') == stat.st_size:
+                    entries[name] = old
+                    continue
+                try:
+                    scanned = scan_file(entry.path)
+                except (OSError, SyntaxError, ValueError) as e:
+                    print_debug(
+                        f"Failed to scan module {name}: {e}", color='red')
+                    scanned = {
+                        'types': {}, 'aliases': {}, 'schemas': {},
+                        'dynamic': True,
+                    }
+                scanned['mtime'] = stat.st_mtime_ns
+                scanned['size'] = stat.st_size
+                entries[name] = scanned
+                changed = True
+            if changed or set(cached) != set(entries):
+                self._write_cache(entries)
+            self._entries = entries
+            self._index()
+
+    def _index(self):
+        """Build the type -> file and alias -> canonical lookups."""
+        types = {}
+        canonical = {}
+        for name, entry in self._entries.items():
+            for module_type in entry['types']:
+                types[module_type] = name
+            for alias, cls in entry['aliases'].items():
+                types.setdefault(alias, name)
+                # Same rule as module._import_module: the first type in
+                # module_map for the class, else the file name.
+                canonical[alias] = next(
+                    (t for t, c in entry['types'].items() if c == cls),
+                    name)
+        self._types = types
+        self._canonical = canonical
+
+    def file_for(self, module_type):
+        """Return the modules/ file defining a type or alias, or None."""
+        return self._types.get(module_type)
+
+    def canonical(self, module_type):
+        """Return the canonical type for an alias, or None."""
+        return self._canonical.get(module_type)
+
+    def dynamic_files(self):
+        """Return files whose maps can only be learned by importing."""
+        return [n for n, e in (self._entries or {}).items() if e['dynamic']]
+
+    def module_types(self):
+        """Return every type defined in module_map, sorted."""
+        return sorted(
+            t for e in (self._entries or {}).values() for t in e['types'])
+
+    def schema(self, module_type):
+        """Return the SCHEMA for a type, or None if not known statically."""
+        name = self._types.get(module_type)
+        if name is None:
+            return None
+        entry = self._entries[name]
+        cls = entry['types'].get(module_type) or \
+            entry['aliases'].get(module_type)
+        return entry['schemas'].get(cls)
+
+    def invalidate(self):
+        """Rescan on the next load()."""
+        with self._lock:
+            self._entries = None
+
+
+# Module-level singleton
+manifest = Manifest()
@@ -0,0 +1,138 @@
+"""
+Description: Low-overhead per-module runtime metrics
+Author: thnikk
+"""
+import bisect
+import threading
+
+# Histogram bucket upper bounds in milliseconds; the last bucket is +inf.
+BUCKETS_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000)
+
+OUTCOMES = ('success', 'empty', 'stale', 'exception')
+
+
+class Histogram:
+    """Fixed-bucket latency histogram with count, sum and max."""
+
+    __slots__ = ('counts', 'count', 'total', 'max')
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS_MS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, seconds):
+        """Record one sample given in seconds."""
+        ms = seconds * 1000
+        self.counts[bisect.bisect_left(BUCKETS_MS, ms)] += 1
+        self.count += 1
+        self.total += ms
+        if ms > self.max:
+            self.max = ms
+
+    def quantile(self, q):
+        """Return the bucket bound containing quantile q, in ms."""
+        if not self.count:
+            return None
+        target = q * self.count
+        seen = 0
+        for bound, n in zip(BUCKETS_MS, self.counts):
+            seen += n
+            if seen >= target:
+                return bound
+        return round(self.max, 2)
+
+    def as_dict(self):
+        """Return a JSON-serializable summary."""
+        return {
+            'count': self.count,
+            'mean_ms': round(self.total / self.count, 2)
+            if self.count else None,
+            'p50_ms': self.quantile(0.5),
+            'p95_ms': self.quantile(0.95),
+            'max_ms': round(self.max, 2),
+            'buckets': dict(zip(
+                [str(b) for b in BUCKETS_MS] + ['inf'], self.counts)),
+        }
+
+
+class ModuleMetrics:
+    """Counters and histograms for one module."""
+
+    __slots__ = ('outcomes', 'fetch', 'dispatch', 'ui', 'payload_bytes')
+
+    def __init__(self):
+        self.outcomes = dict.fromkeys(OUTCOMES, 0)
+        self.fetch = Histogram()
+        self.dispatch = Histogram()
+        self.ui = Histogram()
+        self.payload_bytes = 0
+
+    def as_dict(self):
+        """Return a JSON-serializable summary."""
+        return {
+            'outcomes': dict(self.outcomes),
+            'fetch': self.fetch.as_dict(),
+            'dispatch': self.dispatch.as_dict(),
+            'update_ui': self.ui.as_dict(),
+            'payload_bytes': self.payload_bytes,
+        }
+
+
+class Metrics:
+    """
+    Collects fetch latency and outcome counts from workers, payload size
+    from StateManager, and dispatch/update_ui timings from the GTK
+    thread. Always on; each record is a dict lookup and a few adds.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._modules = {}
+
+    def _get(self, name):
+        """Return metrics for name, creating them; caller holds lock."""
+        m = self._modules.get(name)
+        if m is None:
+            m = self._modules[name] = ModuleMetrics()
+        return m
+
+    def record_fetch(self, name, outcome, seconds):
+        """Record a fetch outcome (see OUTCOMES) and its latency."""
+        with self._lock:
+            m = self._get(name)
+            m.outcomes[outcome] += 1
+            m.fetch.observe(seconds)
+
+    def record_payload(self, name, size):
+        """Record the serialized size of the latest payload."""
+        with self._lock:
+            self._get(name).payload_bytes = size
+
+    def record_dispatch(self, name, seconds):
+        """Record time from state update to UI dispatch."""
+        with self._lock:
+            self._get(name).dispatch.observe(seconds)
+
+    def record_ui(self, name, seconds):
+        """Record time spent in a module's UI callbacks."""
+        with self._lock:
+            self._get(name).ui.observe(seconds)
+
+    def snapshot(self, names=None):
+        """Return {name: summary} for all or selected modules."""
+        with self._lock:
+            return {
+                name: m.as_dict() for name, m in sorted(self._modules.items())
+                if names is None or name in names
+            }
+
+    def reset(self):
+        """Discard all collected metrics."""
+        with self._lock:
+            self._modules.clear()
+
+
+# Module-level singleton
+metrics = Metrics()
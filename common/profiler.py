@@ -0,0 +1,96 @@
+"""
+Description: Sampling profiler producing collapsed stacks
+Author: thnikk
+"""
+import os
+import sys
+import time
+import threading
+from collections import Counter
+
+DEFAULT_RATE = 100
+MAX_RATE = 1000
+DEFAULT_DURATION = 10
+MAX_DURATION = 120
+
+# Leaf frames where a thread is blocked rather than running Python code.
+_IDLE_LEAVES = {
+    ('threading.py', 'wait'),
+    ('threading.py', '_wait_for_tstate_lock'),
+    ('queue.py', 'get'),
+    ('selectors.py', 'select'),
+    ('Gio.py', 'run'),
+}
+
+
+def _label(code):
+    """Return 'file:function' for a code object."""
+    name = getattr(code, 'co_qualname', code.co_name)
+    return f"{os.path.basename(code.co_filename)[:-3]}:{name}"
+
+
+def _is_idle(frame):
+    """True if the innermost frame is a known blocking wait."""
+    code = frame.f_code
+    return (os.path.basename(code.co_filename), code.co_name) in _IDLE_LEAVES
+
+
+def sample(duration=DEFAULT_DURATION, rate=DEFAULT_RATE, jobs=None,
+           include_idle=False):
+    """
+    Sample every thread's stack rate times a second for duration
+    seconds and return collapsed stacks.
+
+    Each stack is rooted at the module that owns the thread: the job a
+    scheduler worker is polling (from jobs(), a callable returning
+    {thread ident: job name}) or otherwise the thread name. Threads
+    parked in a wait are skipped unless include_idle is set.
+    """
+    duration = min(max(float(duration), 0.1), MAX_DURATION)
+    rate = min(max(int(rate), 1), MAX_RATE)
+    interval = 1 / rate
+    me = threading.get_ident()
+    stacks = Counter()
+    roots = Counter()
+    samples = 0
+    idle = 0
+
+    start = time.monotonic()
+    deadline = start + duration
+    next_tick = start
+    while True:
+        now = time.monotonic()
+        if now >= deadline:
+            break
+        if now < next_tick:
+            time.sleep(next_tick - now)
+        next_tick += interval
+
+        names = {t.ident: t.name for t in threading.enumerate()}
+        active = jobs() if jobs else {}
+        samples += 1
+        for ident, frame in sys._current_frames().items():
+            if ident == me:
+                continue
+            if not include_idle and _is_idle(frame):
+                idle += 1
+                continue
+            root = active.get(ident) or names.get(ident, str(ident))
+            labels = []
+            while frame is not None:
+                labels.append(_label(frame.f_code))
+                frame = frame.f_back
+            labels.append(root)
+            stacks[';'.join(reversed(labels))] += 1
+            roots[root] += 1
+
+    return {
+        'duration': round(time.monotonic() - start, 3),
+        'rate': rate,
+        'samples': samples,
+        'idle': idle,
+        'threads': dict(roots.most_common()),
+        'collapsed': [
+            f"{stack} {count}" for stack, count in stacks.most_common()
+        ],
+    }
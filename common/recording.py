@@ -0,0 +1,254 @@
+"""
+Description: Record and replay of the StateManager update stream
+Author: thnikk
+"""
+import os
+import gzip
+import json
+import time
+import threading
+from gi.repository import GLib
+from common.metrics import Histogram
+from common.state import state_manager
+
+RECORDING_FORMAT = 'pybar-state'
+RECORDING_VERSION = 1
+
+# How long a max-speed replay waits for one update to be drawn before
+# moving on, in seconds.
+STEP_TIMEOUT = 5
+# How long a replay waits for the last updates to be drawn, in seconds.
+DRAIN_TIMEOUT = 10
+
+
+class StateRecorder:
+    """
+    Appends every StateManager.update() to a gzipped JSON lines file.
+
+    The first line is a header; each following line is
+    [seconds since start, key, payload]. While recording, the recorder
+    is installed as state_manager.recorder, so the cost when idle is a
+    single attribute check per update.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._file = None
+        self._origin = 0
+        self.path = None
+        self.events = 0
+
+    @property
+    def active(self):
+        """True while a recording is open."""
+        return self._file is not None
+
+    def start(self, path):
+        """Start recording to path, replacing any recording in progress."""
+        path = os.path.expanduser(path)
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        f = gzip.open(path, 'wt', encoding='utf-8')
+        f.write(json.dumps({
+            'format': RECORDING_FORMAT,
+            'version': RECORDING_VERSION,
+            'started': time.time(),
+        }) + '\n')
+        self.stop()
+        with self._lock:
+            self._file = f
+            self._origin = time.monotonic()
+            self.path = path
+            self.events = 0
+        state_manager.recorder = self
+        return path
+
+    def record(self, name, data):
+        """Append one update; called from whichever thread published it."""
+        line = json.dumps(
+            [round(time.monotonic() - self._origin, 4), name, data],
+            separators=(',', ':'), default=repr)
+        with self._lock:
+            if self._file is None:
+                return
+            self._file.write(line + '\n')
+            self.events += 1
+
+    def stop(self):
+        """Close the recording; returns a summary or None if idle."""
+        if state_manager.recorder is self:
+            state_manager.recorder = None
+        with self._lock:
+            f = self._file
+            if f is None:
+                return None
+            self._file = None
+            f.close()
+            summary = {
+                'path': self.path,
+                'events': self.events,
+                'duration': round(time.monotonic() - self._origin, 3),
+            }
+        try:
+            summary['bytes'] = os.path.getsize(self.path)
+        except OSError:
+            pass
+        return summary
+
+
+def read_recording(path):
+    """
+    Return the [(offset, key, payload), ...] events of a recording. A
+    recording cut short (pybar killed mid-write) yields the events
+    that were written completely.
+    """
+    events = []
+    with gzip.open(os.path.expanduser(path), 'rt', encoding='utf-8') as f:
+        try:
+            header = json.loads(f.readline() or '{}')
+        except (OSError, ValueError):
+            header = {}
+        if header.get('format') != RECORDING_FORMAT:
+            raise ValueError(f"{path} is not a pybar state recording")
+        if header.get('version') != RECORDING_VERSION:
+            raise ValueError(
+                f"Unsupported recording version {header.get('version')}")
+        try:
+            for line in f:
+                if line.endswith('\n'):
+                    events.append(tuple(json.loads(line)))
+        except EOFError:
+            pass
+    return events
+
+
+class _ReplayStats:
+    """Per-key counters and timings collected while replaying."""
+
+    __slots__ = ('fed', 'unchanged', 'dispatches', 'latency', 'ui')
+
+    def __init__(self):
+        self.fed = 0
+        self.unchanged = 0
+        self.dispatches = 0
+        self.latency = Histogram()
+        self.ui = Histogram()
+
+    def as_dict(self, elapsed):
+        """Return a JSON-serializable summary."""
+        return {
+            'fed': self.fed,
+            'unchanged': self.unchanged,
+            'dispatches': self.dispatches,
+            'dispatches_per_s': round(self.dispatches / elapsed, 1)
+            if elapsed else None,
+            'latency': self.latency.as_dict(),
+            'update_ui': self.ui.as_dict(),
+        }
+
+
+def _wait_idle(timeout):
+    """Block until the main loop has drained pending state dispatches."""
+    done = threading.Event()
+
+    def mark():
+        done.set()
+        return False
+
+    # Runs after the drain, which is queued at a higher idle priority.
+    GLib.idle_add(mark, priority=GLib.PRIORITY_LOW)
+    return done.wait(timeout)
+
+
+def replay(events, speed=1.0, keys=None):
+    """
+    Feed recorded events into state_manager and report how the UI kept
+    up. Blocks, so call it off the GTK thread.
+
+    speed scales the recorded timing (2 plays twice as fast). With
+    speed 0 events are fed as fast as the UI draws them: each update
+    that changes a subscribed key waits for its dispatch before the
+    next is sent, so every payload reaches update_ui. Keys nothing
+    subscribes to are skipped, and live updates to replayed keys are
+    held back until the replay ends.
+
+    Latency is measured from the update until its subscribers' update_ui
+    callbacks return; update_ui is the time spent in those callbacks.
+    Only batched dispatch is measured.
+    """
+    speed = max(float(speed), 0)
+    subscribed = set(state_manager.subscribers)
+    replayed = {
+        name for _, name, _ in events
+        if name in subscribed and (keys is None or name in keys)
+    }
+    stats = {name: _ReplayStats() for name in replayed}
+    skipped = {}
+    lock = threading.Lock()
+    step = threading.Event()
+    awaiting = [None]
+
+    def probe(name, queued, started, finished):
+        entry = stats.get(name)
+        if entry is None:
+            return
+        with lock:
+            entry.dispatches += 1
+            entry.ui.observe(finished - started)
+            if queued is not None:
+                entry.latency.observe(finished - queued)
+        if name == awaiting[0]:
+            step.set()
+
+    state_manager.hold(replayed)
+    state_manager.probe = probe
+    start = time.monotonic()
+    try:
+        origin = events[0][0] if events else 0
+        for offset, name, data in events:
+            if name not in replayed:
+                if keys is None or name in keys:
+                    skipped[name] = skipped.get(name, 0) + 1
+                continue
+            if speed:
+                delay = start + (offset - origin) / speed - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+            version = state_manager.version(name)
+            if not speed:
+                step.clear()
+                awaiting[0] = name
+            state_manager.update(name, data, force=True)
+            with lock:
+                stats[name].fed += 1
+                if state_manager.version(name) == version:
+                    stats[name].unchanged += 1
+                    continue
+            if not speed:
+                step.wait(STEP_TIMEOUT)
+        awaiting[0] = None
+        _wait_idle(DRAIN_TIMEOUT)
+        elapsed = time.monotonic() - start
+    finally:
+        if state_manager.probe is probe:
+            state_manager.probe = None
+        state_manager.release(replayed)
+
+    fed = sum(s.fed for s in stats.values())
+    dispatches = sum(s.dispatches for s in stats.values())
+    return {
+        'events': fed,
+        'speed': speed or 'max',
+        'elapsed': round(elapsed, 3),
+        'events_per_s': round(fed / elapsed, 1) if elapsed else None,
+        'dispatches': dispatches,
+        'dispatches_per_s': round(dispatches / elapsed, 1)
+        if elapsed else None,
+        'skipped': skipped,
+        'modules': {
+            name: stats[name].as_dict(elapsed) for name in sorted(stats)
+        },
+    }
+
+
+# Module-level singleton
+recorder = StateRecorder()
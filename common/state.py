@@ -2,26 +2,121 @@
 Description: StateManager and singleton state_manager instance
 Author: thnikk
 """
+import json
+import time
+import threading
 import gi
 gi.require_version('GLib', '2.0')
 from gi.repository import GLib  # noqa
+from common.metrics import metrics
+from common.watchdog import watchdog, unwatched
+
+# Default drain priority for keys without an explicit one (lower first).
+DEFAULT_KEY_PRIORITY = 100
+
+# Top-level fields that change every tick without affecting the UI.
+VOLATILE_FIELDS = frozenset({'timestamp'})
+
+
+def _digest(value):
+    """Return (structural hash, serialized length) of a JSON-like value."""
+    try:
+        encoded = json.dumps(value, sort_keys=True, default=repr)
+        return hash(encoded), len(encoded)
+    except (TypeError, ValueError):
+        # Unserializable or circular; never treat as unchanged.
+        return object(), 0
+
+
+def fingerprint(data, volatile=VOLATILE_FIELDS):
+    """
+    Return a per-field digest of data, ignoring volatile fields.
+    Non-dict payloads are digested as a whole under the None key.
+    """
+    if isinstance(data, dict):
+        return {
+            k: _digest(v) for k, v in data.items() if k not in volatile
+        }
+    return {None: _digest(data)}
 
 
 class StateManager:
-    """Pub/sub state store that dispatches updates on the GLib main loop."""
+    """
+    Pub/sub state store that dispatches updates on the GLib main loop.
+
+    In batched mode (the default) update() only marks the key dirty and
+    a single idle callback drains every dirty key in one pass, so the
+    number of main-loop wakeups scales with frames rather than with
+    subscribers x updates. Setting batched to False restores one idle
+    source per subscriber.
+
+    Each update is fingerprinted (ignoring volatile fields such as
+    timestamp); payloads identical to the current one are stored but
+    never dispatched. version(name) counts real changes, and callbacks
+    can call changed_fields(name) to do partial updates.
+
+    recorder, when set, is handed every update before it is applied,
+    and probe is called after each key's batched dispatch. Both exist
+    for recording and replaying the update stream (common.recording).
+    """
 
-    def __init__(self):
+    def __init__(self, batched=True):
         self.data = {'debug': False}
         self.subscribers = {}
+        self.batched = batched
         self._next_id = 0
         # Track sub IDs with a pending idle callback to avoid double-queuing.
         self._pending = set()
+        # Batched mode: dirty keys, new subscribers awaiting their first
+        # value, and the ID of the scheduled drain source.
+        self._lock = threading.Lock()
+        self._dirty = set()
+        self._dirty_subs = set()
+        self._flush_id = None
+        self._priorities = {}
+        # Change detection: per-key field digests, versions, and the
+        # fields changed since the key was last drained.
+        self._fingerprints = {}
+        self._versions = {}
+        self._changed = {}
+        self._volatile = {}
+        self._full_refresh = False
+        self._drained = None
+        # Monotonic time each dirty key was first marked, for latency.
+        self._dirty_since = {}
+        # Keys whose live updates are dropped while a replay owns them.
+        self._held = frozenset()
+        self.recorder = None
+        self.probe = None
+        self.stats = {
+            'updates': 0,
+            'unchanged': 0,
+            'coalesced': 0,
+            'flushes': 0,
+            'callbacks': 0,
+        }
 
     def _generate_id(self):
         """Generate a unique subscription ID."""
         self._next_id += 1
         return self._next_id
 
+    def _call(self, name, callback, data):
+        """Run one subscriber callback, logging failures."""
+        start = time.perf_counter()
+        try:
+            callback(data)
+        except Exception as e:
+            # Avoid importing print_debug here to prevent circular imports
+            print(f"[StateManager] Callback failed for {name}: {e}")
+        elapsed = time.perf_counter() - start
+        metrics.record_ui(name, elapsed)
+        watchdog.record(
+            name, getattr(callback, '__qualname__', repr(callback)), elapsed)
+
+    # Per-callback timing happens in _call, so the watchdog doesn't also
+    # need to time the idle sources that drive it.
+    @unwatched
     def _dispatch(self, sub_id, name, callback):
         """Fire callback with latest data; called from GLib main loop."""
         self._pending.discard(sub_id)
@@ -30,20 +125,145 @@ class StateManager:
             return False
         data = self.data.get(name)
         if data is not None:
-            try:
-                callback(data)
-            except Exception as e:
-                # Avoid importing print_debug here to prevent circular imports
-                print(f"[StateManager] Callback failed for {name}: {e}")
+            self.stats['callbacks'] += 1
+            self._full_refresh = True
+            self._call(name, callback, data)
+            self._full_refresh = False
         return False
 
-    def update(self, name, new_data):
-        """Update state and notify subscribers."""
+    def _schedule_flush(self):
+        """Queue the drain callback if one isn't already pending."""
+        # Caller holds self._lock.
+        if self._flush_id is None:
+            self._flush_id = GLib.idle_add(
+                self._flush, priority=GLib.PRIORITY_DEFAULT_IDLE
+            )
+
+    def flush(self):
+        """
+        Drain pending updates now instead of on the next idle pass.
+
+        GTK thread only. Used at startup so state published before the
+        bars were drawn is on screen in their first frame.
+        """
+        if not self.batched:
+            return
+        with self._lock:
+            flush_id = self._flush_id
+        if flush_id is None:
+            return
+        GLib.source_remove(flush_id)
+        self._flush()
+
+    @unwatched
+    def _flush(self):
+        """Drain all dirty keys in priority order on the GLib main loop."""
+        with self._lock:
+            dirty = self._dirty
+            dirty_subs = self._dirty_subs
+            changed = {name: self._changed.pop(name, None) for name in dirty}
+            since = self._dirty_since
+            self._dirty_since = {}
+            self._dirty = set()
+            self._dirty_subs = set()
+            self._flush_id = None
+        self.stats['flushes'] += 1
+
+        now = time.monotonic()
+        for name in sorted(dirty, key=self.get_priority):
+            data = self.data.get(name)
+            if data is None:
+                continue
+            if name in since:
+                metrics.record_dispatch(name, now - since[name])
+            self._drained = (name, changed[name])
+            started = time.monotonic()
+            for sub_id, callback in list(
+                    self.subscribers.get(name, {}).items()):
+                # A brand-new subscriber needs everything, not a delta.
+                self._full_refresh = sub_id in dirty_subs
+                dirty_subs.discard(sub_id)
+                self.stats['callbacks'] += 1
+                self._call(name, callback, data)
+            probe = self.probe
+            if probe is not None:
+                probe(name, since.get(name), started, time.monotonic())
+        self._drained = None
+
+        # New subscribers whose key didn't change in this pass.
+        self._full_refresh = True
+        for sub_id in dirty_subs:
+            for name, subs in self.subscribers.items():
+                callback = subs.get(sub_id)
+                if callback is None:
+                    continue
+                data = self.data.get(name)
+                if data is not None:
+                    self.stats['callbacks'] += 1
+                    self._call(name, callback, data)
+                break
+        self._full_refresh = False
+        return False
+
+    def _detect_change(self, name, new_data):
+        """
+        Record new_data's fingerprint and return the set of changed
+        top-level fields (empty if the payload is unchanged).
+        """
+        volatile = self._volatile.get(name, VOLATILE_FIELDS)
+        new_fp = fingerprint(new_data, volatile)
+        metrics.record_payload(
+            name, sum(size for _, size in new_fp.values()))
+        with self._lock:
+            old_fp = self._fingerprints.get(name)
+            self._fingerprints[name] = new_fp
+            if old_fp is None:
+                changed = set(new_fp)
+            else:
+                changed = {
+                    k for k in new_fp.keys() | old_fp.keys()
+                    if new_fp.get(k) != old_fp.get(k)
+                }
+            if changed:
+                self._versions[name] = self._versions.get(name, 0) + 1
+                if name in self._dirty and name in self._changed:
+                    self._changed[name] |= changed
+                else:
+                    self._changed[name] = set(changed)
+            return changed
+
+    def update(self, name, new_data, force=False):
+        """
+        Update state and notify subscribers if anything changed. Updates
+        to held keys are dropped unless force is set.
+        """
+        recorder = self.recorder
+        if recorder is not None:
+            recorder.record(name, new_data)
+        if name in self._held and not force:
+            return
+        changed = self._detect_change(name, new_data)
         self.data[name] = new_data
+        if not changed:
+            with self._lock:
+                self.stats['unchanged'] += 1
+            return
         if name not in self.subscribers:
             return
+        if self.batched:
+            with self._lock:
+                self.stats['updates'] += 1
+                if name in self._dirty:
+                    self.stats['coalesced'] += 1
+                    return
+                self._dirty.add(name)
+                self._dirty_since[name] = time.monotonic()
+                self._schedule_flush()
+            return
+        self.stats['updates'] += 1
         for sub_id, callback in list(self.subscribers[name].items()):
             if sub_id in self._pending:
+                self.stats['coalesced'] += 1
                 continue
             self._pending.add(sub_id)
             GLib.idle_add(
@@ -58,7 +278,13 @@ class StateManager:
             self.subscribers[name] = {}
         self.subscribers[name][sub_id] = callback
         # Fire immediately with current value if one exists.
-        if name in self.data and sub_id not in self._pending:
+        if name not in self.data:
+            return sub_id
+        if self.batched:
+            with self._lock:
+                self._dirty_subs.add(sub_id)
+                self._schedule_flush()
+        elif sub_id not in self._pending:
             self._pending.add(sub_id)
             GLib.idle_add(
                 self._dispatch, sub_id, name, callback,
@@ -66,9 +292,28 @@ class StateManager:
             )
         return sub_id
 
+    def resend(self, sub_id):
+        """Redeliver the current value to one subscriber on the next drain."""
+        if self.batched:
+            with self._lock:
+                self._dirty_subs.add(sub_id)
+                self._schedule_flush()
+            return
+        for name, subs in self.subscribers.items():
+            callback = subs.get(sub_id)
+            if callback is not None and sub_id not in self._pending:
+                self._pending.add(sub_id)
+                GLib.idle_add(
+                    self._dispatch, sub_id, name, callback,
+                    priority=GLib.PRIORITY_DEFAULT_IDLE
+                )
+                return
+
     def unsubscribe(self, sub_id):
         """Unsubscribe using the ID returned by subscribe()."""
         self._pending.discard(sub_id)
+        with self._lock:
+            self._dirty_subs.discard(sub_id)
         for name, subs in list(self.subscribers.items()):
             if sub_id in subs:
                 del subs[sub_id]
@@ -77,11 +322,57 @@ class StateManager:
                 return True
         return False
 
+    def version(self, name):
+        """Return how many times name has actually changed."""
+        return self._versions.get(name, 0)
+
+    def changed_fields(self, name):
+        """
+        Return the top-level fields of name that changed since its
+        previous dispatch, or None when the caller should refresh
+        everything (first delivery to a subscriber, or unknown key).
+        """
+        if self._full_refresh:
+            return None
+        drained = self._drained
+        if drained and drained[0] == name:
+            return frozenset(drained[1]) if drained[1] is not None else None
+        return None
+
+    def hold(self, names):
+        """Drop live updates to names until release() is called."""
+        with self._lock:
+            self._held = self._held | frozenset(names)
+
+    def release(self, names):
+        """Accept live updates to names again."""
+        with self._lock:
+            self._held = self._held - frozenset(names)
+
+    def set_volatile(self, name, fields):
+        """Add top-level fields of name to ignore when detecting changes."""
+        self._volatile[name] = VOLATILE_FIELDS | frozenset(fields)
+
+    def set_priority(self, name, priority):
+        """Set the drain order for a key; lower values dispatch first."""
+        self._priorities[name] = priority
+
+    def get_priority(self, name):
+        """Return the drain priority for a key."""
+        return self._priorities.get(name, DEFAULT_KEY_PRIORITY)
+
     def clear(self):
         """Clear all data and subscribers."""
         self.data.clear()
         self.subscribers.clear()
         self._pending.clear()
+        with self._lock:
+            self._dirty.clear()
+            self._dirty_subs.clear()
+            self._dirty_since.clear()
+            self._fingerprints.clear()
+            self._versions.clear()
+            self._changed.clear()
 
     def get(self, name):
         """Return current value for name, or None."""
@@ -91,6 +382,11 @@ class StateManager:
         """Return subscription counts per name."""
         return {name: len(subs) for name, subs in self.subscribers.items()}
 
+    def dispatch_stats(self):
+        """Return update/flush counters, including coalesced updates."""
+        with self._lock:
+            return dict(self.stats)
+
 
 # Module-level singleton
 state_manager = StateManager()
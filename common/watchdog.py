@@ -0,0 +1,129 @@
+"""
+Description: Main-loop stall watchdog with culprit attribution
+Author: thnikk
+"""
+import time
+import logging
+import functools
+import threading
+from collections import deque
+import gi
+gi.require_version('GLib', '2.0')
+from gi.repository import GLib  # noqa
+
+# Callbacks running longer than this on the GTK thread are reported.
+DEFAULT_BUDGET_MS = 8
+# Number of recent stalls kept for the IPC 'stalls' action.
+RING_SIZE = 100
+
+
+def _describe(function):
+    """Return (module, callback) names for a callable."""
+    func = getattr(function, '__func__', function)
+    mod = getattr(func, '__module__', None) or '?'
+    if mod.startswith('modules.'):
+        mod = mod[len('modules.'):]
+    name = getattr(func, '__qualname__', None) or repr(func)
+    return mod, name
+
+
+class Watchdog:
+    """
+    Times callbacks that run on the GTK main loop and records the ones
+    that exceed the budget.
+
+    install() wraps GLib.idle_add, timeout_add and timeout_add_seconds
+    so every idle/timeout source is timed and attributed to the module
+    and function that queued it. StateManager reports subscriber
+    callbacks through record() with the state key as the module.
+    Functions marked with unwatched() are not wrapped.
+    """
+
+    def __init__(self, budget_ms=DEFAULT_BUDGET_MS):
+        self.budget = budget_ms / 1000
+        self._lock = threading.Lock()
+        self._stalls = deque(maxlen=RING_SIZE)
+        self._total = 0
+        self._installed = False
+
+    def set_budget(self, budget_ms):
+        """Set the stall budget in milliseconds; 0 disables reporting."""
+        self.budget = budget_ms / 1000
+
+    def record(self, module, callback, seconds):
+        """Log and store a callback run if it went over budget."""
+        if not self.budget or seconds < self.budget:
+            return
+        ms = seconds * 1000
+        with self._lock:
+            self._total += 1
+            self._stalls.append({
+                'time': time.time(),
+                'module': module,
+                'callback': callback,
+                'ms': round(ms, 2),
+            })
+        logging.getLogger('watchdog').warning(
+            f"Main loop stall: {ms:.1f} ms in {module}:{callback} "
+            f"(budget {self.budget * 1000:.0f} ms)")
+
+    def wrap(self, function):
+        """Return function wrapped so each call is timed."""
+        if getattr(function, '_unwatched', False):
+            return function
+        module, name = _describe(function)
+
+        @functools.wraps(function)
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                self.record(module, name, time.perf_counter() - start)
+        return timed
+
+    def install(self):
+        """Wrap GLib's idle/timeout source constructors."""
+        if self._installed:
+            return
+        self._installed = True
+        idle_add = GLib.idle_add
+        timeout_add = GLib.timeout_add
+        timeout_add_seconds = GLib.timeout_add_seconds
+
+        def watched_idle_add(function, *args, **kwargs):
+            return idle_add(self.wrap(function), *args, **kwargs)
+
+        def watched_timeout_add(interval, function, *args, **kwargs):
+            return timeout_add(interval, self.wrap(function), *args, **kwargs)
+
+        def watched_timeout_add_seconds(interval, function, *args, **kwargs):
+            return timeout_add_seconds(
+                interval, self.wrap(function), *args, **kwargs)
+
+        GLib.idle_add = watched_idle_add
+        GLib.timeout_add = watched_timeout_add
+        GLib.timeout_add_seconds = watched_timeout_add_seconds
+
+    def stalls(self, clear=False):
+        """Return recent stalls (oldest first) and the total count."""
+        with self._lock:
+            result = {
+                'budget_ms': round(self.budget * 1000, 2),
+                'total': self._total,
+                'recent': list(self._stalls),
+            }
+            if clear:
+                self._stalls.clear()
+                self._total = 0
+        return result
+
+
+def unwatched(function):
+    """Mark a function so install() leaves it unwrapped."""
+    function._unwatched = True
+    return function
+
+
+# Module-level singleton
+watchdog = Watchdog()
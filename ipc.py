@@ -4,6 +4,7 @@ Description: Unix socket IPC server for pybar widget control
 Author: thnikk
 """
 import os
+import time
 import socket
 import threading
 import json
@@ -15,11 +16,300 @@ from gi.repository import GLib
 # Default socket path
 SOCKET_PATH = os.path.expanduser('~/.cache/pybar/pybar.sock')
 
+# Longest command line accepted before the connection is dropped.
+MAX_LINE_BYTES = 64 * 1024
+# Unsent output a slow reader may accumulate before it is disconnected.
+MAX_OUTBUF_BYTES = 1024 * 1024
+# Bytes read per readiness callback.
+RECV_SIZE = 65536
+# Subscription events are held back (and coalesced per key) while more
+# than this much output is still unsent to the subscriber.
+SUBSCRIBE_HIGH_WATER = 64 * 1024
+# Retry delay while a subscriber is backed up, in milliseconds.
+SUBSCRIBE_RETRY_MS = 50
+
+
+def _project(data, fields):
+    """
+    Return only the requested fields of data. A field may be a dotted
+    path ("device.name") to pick a nested value; unknown fields are
+    left out.
+    """
+    if not isinstance(data, dict):
+        return data
+    result = {}
+    for field in fields:
+        value = data
+        for part in str(field).split('.'):
+            if not isinstance(value, dict) or part not in value:
+                break
+            value = value[part]
+        else:
+            result[field] = value
+    return result
+
+
+class _Connection:
+    """
+    One client connection driven by GLib fd watches.
+
+    Input is framed on newlines into a bounded buffer; output is sent
+    immediately when the socket accepts it and queued behind an IO_OUT
+    watch otherwise.
+    """
+
+    __slots__ = (
+        'server', 'sock', 'inbuf', 'outbuf', 'in_watch', 'out_watch',
+        'persist', 'awaiting', 'closing', 'closed')
+
+    def __init__(self, server, sock):
+        self.server = server
+        self.sock = sock
+        self.inbuf = bytearray()
+        self.outbuf = bytearray()
+        self.persist = False
+        # Replies still being computed off the main loop.
+        self.awaiting = 0
+        self.closing = False
+        self.closed = False
+        self.out_watch = None
+        self.in_watch = GLib.io_add_watch(
+            sock.fileno(), GLib.PRIORITY_DEFAULT,
+            GLib.IO_IN | GLib.IO_HUP | GLib.IO_ERR, self._on_readable)
+
+    def _on_readable(self, _fd, condition):
+        """Read what is available and handle every complete line."""
+        try:
+            chunk = self.sock.recv(RECV_SIZE)
+        except BlockingIOError:
+            return True
+        except OSError:
+            chunk = b''
+        if not chunk:
+            self.in_watch = None
+            # Peer closed its write side. A last command without a
+            # trailing newline is still answered; close once every
+            # reply, deferred ones included, has been sent.
+            if self.inbuf.strip():
+                line = bytes(self.inbuf)
+                self.inbuf.clear()
+                self.server._handle_line(self, line)
+            if self.closed:
+                return False
+            if self in self.server._subscriptions:
+                # socat, nc -N and ncat half-close right after sending
+                # subscribe; keep streaming until a write fails or the
+                # peer hangs up completely.
+                self.in_watch = GLib.io_add_watch(
+                    self.sock.fileno(), GLib.PRIORITY_DEFAULT,
+                    GLib.IO_HUP | GLib.IO_ERR, self._on_hangup)
+                return False
+            self.persist = False
+            if not self.awaiting:
+                self.close_when_drained()
+            return False
+
+        self.inbuf += chunk
+        handled = False
+        while not self.closed:
+            newline = self.inbuf.find(b'\n')
+            if newline < 0:
+                break
+            line = bytes(self.inbuf[:newline])
+            del self.inbuf[:newline + 1]
+            if line.strip():
+                self.server._handle_line(self, line)
+                handled = True
+
+        if self.closed:
+            return False
+        if len(self.inbuf) > MAX_LINE_BYTES:
+            self.inbuf.clear()
+            self.send({'status': 'error', 'message': 'Command too long'})
+            self.in_watch = None
+            self.close_when_drained()
+            return False
+        if handled and not self.persist and not self.awaiting:
+            # One-shot client: reply and hang up, as nc expects.
+            self.in_watch = None
+            self.close_when_drained()
+            return False
+        return True
+
+    def _on_hangup(self, _fd, _condition):
+        """Close a half-closed subscriber once the peer is fully gone."""
+        self.in_watch = None
+        self.close()
+        return False
+
+    def reply_later(self, data):
+        """Send a deferred reply; hang up after it if one-shot."""
+        self.awaiting -= 1
+        if not self.send(data):
+            return
+        if not self.persist and not self.awaiting:
+            if self.in_watch is not None:
+                GLib.source_remove(self.in_watch)
+                self.in_watch = None
+            self.close_when_drained()
+
+    def send(self, data):
+        """Queue a JSON line; returns False if the client was dropped."""
+        if self.closed:
+            return False
+        return self.send_raw(
+            json.dumps(data, default=repr).encode() + b'\n')
+
+    def send_raw(self, payload):
+        """Send bytes now, buffering whatever the socket won't take."""
+        if self.closed:
+            return False
+        if not self.outbuf:
+            try:
+                sent = self.sock.send(payload)
+            except BlockingIOError:
+                sent = 0
+            except OSError:
+                self.close()
+                return False
+            payload = payload[sent:]
+            if not payload:
+                return True
+        if len(self.outbuf) + len(payload) > MAX_OUTBUF_BYTES:
+            logging.warning("IPC client not reading; disconnecting")
+            self.close()
+            return False
+        self.outbuf += payload
+        if self.out_watch is None:
+            self.out_watch = GLib.io_add_watch(
+                self.sock.fileno(), GLib.PRIORITY_DEFAULT,
+                GLib.IO_OUT | GLib.IO_HUP | GLib.IO_ERR, self._on_writable)
+        return True
+
+    def _on_writable(self, _fd, condition):
+        """Flush queued output as the socket drains."""
+        try:
+            sent = self.sock.send(self.outbuf)
+        except BlockingIOError:
+            return True
+        except OSError:
+            self.out_watch = None
+            self.close()
+            return False
+        del self.outbuf[:sent]
+        if self.outbuf:
+            return True
+        self.out_watch = None
+        if self.closing:
+            self.close()
+        return False
+
+    def pending(self):
+        """Return the number of bytes waiting to be sent."""
+        return len(self.outbuf)
+
+    def close_when_drained(self):
+        """Close once all queued output has been written."""
+        self.closing = True
+        if not self.outbuf:
+            self.close()
+
+    def close(self):
+        """Remove watches and close the socket."""
+        if self.closed:
+            return
+        self.closed = True
+        for watch in (self.in_watch, self.out_watch):
+            if watch is not None:
+                GLib.source_remove(watch)
+        self.in_watch = self.out_watch = None
+        try:
+            self.sock.close()
+        except OSError:
+            pass
+        self.server._forget(self)
+
+
+class _Subscription:
+    """
+    Streams state updates for selected keys to one connection.
+
+    Each key is sent at most once per interval. Updates that arrive
+    sooner, or while the client is backed up, replace the pending value
+    for that key, so a slow reader always gets the latest state and
+    the count of updates it missed.
+    """
+
+    def __init__(self, conn, keys, interval=0):
+        self.conn = conn
+        self.interval = max(0, interval)
+        self._pending = {}
+        self._coalesced = {}
+        self._last_sent = {}
+        self._timer = None
+        self._sub_ids = [
+            c.state_manager.subscribe(key, self._callback(key))
+            for key in keys
+        ]
+
+    def _callback(self, key):
+        """Return a state callback bound to key."""
+        def on_update(data):
+            if key in self._pending:
+                self._coalesced[key] = self._coalesced.get(key, 0) + 1
+            self._pending[key] = data
+            if self._timer is None:
+                self._pump()
+        return on_update
+
+    def _pump(self):
+        """Send every pending key that is due; reschedule the rest."""
+        self._timer = None
+        if self.conn.closed:
+            return False
+        now = time.monotonic()
+        wait = None
+        for key in list(self._pending):
+            if self.conn.pending() > SUBSCRIBE_HIGH_WATER:
+                wait = SUBSCRIBE_RETRY_MS / 1000
+                break
+            remaining = self._last_sent.get(key, 0) + self.interval - now
+            if remaining > 0:
+                if wait is None or remaining < wait:
+                    wait = remaining
+                continue
+            event = {
+                'event': 'update',
+                'key': key,
+                'data': self._pending.pop(key),
+            }
+            coalesced = self._coalesced.pop(key, 0)
+            if coalesced:
+                event['coalesced'] = coalesced
+            self._last_sent[key] = now
+            if not self.conn.send(event):
+                return False
+        if self._pending and wait is not None:
+            self._timer = GLib.timeout_add(
+                max(1, int(wait * 1000)), self._pump)
+        return False
+
+    def cancel(self):
+        """Drop the state subscriptions and any pending retry."""
+        for sub_id in self._sub_ids:
+            c.state_manager.unsubscribe(sub_id)
+        self._sub_ids = []
+        if self._timer is not None:
+            GLib.source_remove(self._timer)
+            self._timer = None
+        self._pending.clear()
+
 
 class IPCServer:
     """
-    Listens on a Unix domain socket for JSON commands and dispatches
-    widget actions on the GTK main loop via GLib.idle_add.
+    Listens on a Unix domain socket for JSON commands and runs them on
+    the GTK main loop. Sockets are non-blocking and driven by GLib fd
+    watches, so no thread is created per connection.
 
     Supported commands (sent as a single JSON line):
         {"action": "toggle", "widget": "clock"}
@@ -27,21 +317,44 @@ class IPCServer:
         {"action": "show",   "widget": "clock", "monitor": "eDP-1"}
         {"action": "hide",   "widget": "clock"}
         {"action": "reload", "module": "clock"}
+        {"action": "cache"}
+        {"action": "stats", "module": ["cpu", "clock"]}
+        {"action": "stalls", "clear": true}
+        {"action": "subscribe", "keys": ["cpu", "volume"], "interval": 1}
+        {"action": "push", "module": "mail", "data": {"text": "3"}, "ttl": 600}
+        {"action": "get", "keys": ["cpu"], "fields": ["total", "per_cpu"]}
+        {"action": "batch", "commands": [{"action": "get", "keys": "cpu"}]}
+        {"action": "profile", "duration": 10, "rate": 100}
+        {"action": "record", "path": "~/pybar.state.gz"}
+        {"action": "record", "stop": true}
+        {"action": "replay", "path": "~/pybar.state.gz", "speed": 0}
 
     Responses are a single JSON line:
         {"status": "ok", "affected": ["eDP-1"]}
         {"status": "ok", "module": "clock"}
         {"status": "error", "message": "..."}
+
+    The connection is closed after the reply unless the command sets
+    "persist": true, in which case further lines are answered in order
+    on the same connection. "subscribe" keeps the connection open and
+    streams {"event": "update", "key": ..., "data": ...} lines until
+    the client disconnects.
     """
 
     def __init__(self, display):
         self.display = display
-        self._thread = None
         self._sock = None
-        self._running = False
+        self._watch = None
+        self._connections = set()
+        # connection -> _Subscription
+        self._subscriptions = {}
+        # module name -> GLib source marking pushed state stale
+        self._push_timers = {}
+        self._profiling = False
+        self._replaying = False
 
     def start(self):
-        """Create the socket and start the accept thread."""
+        """Create the socket and watch it from the main loop."""
         cache_dir = os.path.dirname(SOCKET_PATH)
         os.makedirs(cache_dir, exist_ok=True)
 
@@ -54,23 +367,30 @@ class IPCServer:
 
         self._sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
         self._sock.bind(SOCKET_PATH)
-        self._sock.listen(5)
-        self._running = True
+        self._sock.listen(128)
+        self._sock.setblocking(False)
 
-        self._thread = threading.Thread(
-            target=self._accept_loop, daemon=True
-        )
-        self._thread.start()
+        self._watch = GLib.io_add_watch(
+            self._sock.fileno(), GLib.PRIORITY_DEFAULT, GLib.IO_IN,
+            self._on_accept)
         logging.info("IPC server listening on %s", SOCKET_PATH)
 
     def stop(self):
         """Stop the server and clean up the socket file."""
-        self._running = False
+        for timer in self._push_timers.values():
+            GLib.source_remove(timer)
+        self._push_timers.clear()
+        if self._watch is not None:
+            GLib.source_remove(self._watch)
+            self._watch = None
+        for conn in list(self._connections):
+            conn.close()
         if self._sock:
             try:
                 self._sock.close()
             except OSError:
                 pass
+            self._sock = None
         if os.path.exists(SOCKET_PATH):
             try:
                 os.unlink(SOCKET_PATH)
@@ -81,71 +401,158 @@ class IPCServer:
     # Internal helpers
     # ------------------------------------------------------------------
 
-    def _accept_loop(self):
-        """Accept connections until stopped."""
-        while self._running:
+    def _on_accept(self, _fd, _condition):
+        """Accept every pending connection."""
+        while True:
             try:
-                conn, _ = self._sock.accept()
-                threading.Thread(
-                    target=self._handle_conn,
-                    args=(conn,),
-                    daemon=True
-                ).start()
-            except OSError:
-                # Socket closed by stop()
+                sock, _ = self._sock.accept()
+            except BlockingIOError:
                 break
-
-    def _handle_conn(self, conn):
-        """Read one newline-terminated JSON message from a connection."""
+            except OSError as e:
+                logging.error("IPC accept failed: %s", e)
+                break
+            sock.setblocking(False)
+            self._connections.add(_Connection(self, sock))
+        return True
+
+    def _forget(self, conn):
+        """Drop a closed connection."""
+        self._connections.discard(conn)
+        sub = self._subscriptions.pop(conn, None)
+        if sub is not None:
+            sub.cancel()
+
+    def _handle_line(self, conn, line):
+        """Parse one framed line and reply on the same connection."""
         try:
-            buf = b''
-            while b'\n' not in buf:
-                chunk = conn.recv(4096)
-                if not chunk:
-                    break
-                buf += chunk
-
-            if not buf.strip():
-                conn.close()
-                return
-
+            cmd = json.loads(line.decode())
+        except (UnicodeDecodeError, json.JSONDecodeError) as e:
+            conn.send({'status': 'error', 'message': f'Invalid JSON: {e}'})
+            return
+        if not isinstance(cmd, dict):
+            conn.send({'status': 'error', 'message': 'Expected an object'})
+            return
+        if cmd.get('persist'):
+            conn.persist = True
+        if cmd.get('action') == 'subscribe':
+            conn.send(self._subscribe(conn, cmd))
+            return
+        if cmd.get('action') == 'profile':
+            self._profile(conn, cmd)
+            return
+        if cmd.get('action') == 'replay':
+            self._replay(conn, cmd)
+            return
+        conn.send(self._dispatch(cmd))
+
+    def _profile(self, conn, cmd):
+        """Sample stacks on a background thread and reply when done."""
+        if self._profiling:
+            conn.send({
+                'status': 'error', 'message': 'A profile is already running'})
+            return
+        from common.profiler import sample, DEFAULT_DURATION, DEFAULT_RATE
+        try:
+            duration = float(cmd.get('duration', DEFAULT_DURATION))
+            rate = int(cmd.get('rate', DEFAULT_RATE))
+        except (TypeError, ValueError):
+            conn.send({
+                'status': 'error', 'message': 'Invalid duration or rate'})
+            return
+        include_idle = bool(cmd.get('idle', False))
+        self._profiling = True
+        conn.awaiting += 1
+
+        def run():
             try:
-                cmd = json.loads(buf.decode().strip())
-            except json.JSONDecodeError as e:
-                self._send(conn, {
-                    'status': 'error',
-                    'message': f'Invalid JSON: {e}'
-                })
-                conn.close()
-                return
-
-            # Hand off to GTK main loop; conn is closed inside _dispatch
-            GLib.idle_add(self._dispatch, cmd, conn)
-
-        except Exception as e:
-            logging.error("IPC connection error: %s", e)
+                result = {'status': 'ok', **sample(
+                    duration, rate, mod.scheduler.active_jobs,
+                    include_idle)}
+            except Exception as e:
+                result = {'status': 'error', 'message': str(e)}
+            GLib.idle_add(finish, result)
+
+        def finish(result):
+            self._profiling = False
+            conn.reply_later(result)
+            return False
+
+        threading.Thread(
+            target=run, name='pybar-profiler', daemon=True).start()
+
+    def _replay(self, conn, cmd):
+        """Replay a state recording on a background thread."""
+        if self._replaying:
+            conn.send({
+                'status': 'error', 'message': 'A replay is already running'})
+            return
+        from common.recording import read_recording, replay
+        path = cmd.get('path')
+        if not path:
+            conn.send({'status': 'error', 'message': 'Missing path'})
+            return
+        try:
+            speed = float(cmd.get('speed', 1))
+        except (TypeError, ValueError):
+            conn.send({'status': 'error', 'message': 'Invalid speed'})
+            return
+        keys = cmd.get('keys')
+        if isinstance(keys, str):
+            keys = [keys]
+        try:
+            events = read_recording(path)
+        except (OSError, ValueError) as e:
+            conn.send({'status': 'error', 'message': str(e)})
+            return
+        self._replaying = True
+        conn.awaiting += 1
+
+        def run():
             try:
-                conn.close()
-            except OSError:
-                pass
-
-    def _dispatch(self, cmd, conn):
-        """Execute a command on the GTK main loop thread."""
+                result = {'status': 'ok', 'path': path, **replay(
+                    events, speed, set(keys) if keys else None)}
+            except Exception as e:
+                result = {'status': 'error', 'message': str(e)}
+            GLib.idle_add(finish, result)
+
+        def finish(result):
+            self._replaying = False
+            conn.reply_later(result)
+            return False
+
+        threading.Thread(
+            target=run, name='pybar-replay', daemon=True).start()
+
+    def _subscribe(self, conn, cmd):
+        """Start streaming state updates to conn."""
+        keys = cmd.get('keys')
+        if isinstance(keys, str):
+            keys = [keys]
+        if not keys:
+            # Default to every key that currently has state.
+            keys = sorted(c.state_manager.data)
+        if not all(isinstance(key, str) for key in keys):
+            return {'status': 'error', 'message': 'keys must be strings'}
         try:
-            result = self._handle_command(cmd)
-        except Exception as e:
-            result = {'status': 'error', 'message': str(e)}
-        finally:
-            self._send(conn, result)
-            conn.close()
-        return False  # Remove from idle queue
-
-    def _send(self, conn, data):
-        """Write a JSON response terminated by a newline."""
+            interval = float(cmd.get('interval', 0))
+        except (TypeError, ValueError):
+            return {'status': 'error', 'message': 'Invalid interval'}
+        old = self._subscriptions.pop(conn, None)
+        if old is not None:
+            old.cancel()
+        conn.persist = True
+        # Reply before the first events, which are queued on the next
+        # state drain.
+        self._subscriptions[conn] = _Subscription(conn, keys, interval)
+        return {'status': 'ok', 'subscribed': keys, 'interval': interval}
+
+    def _dispatch(self, cmd):
+        """Execute a command, turning exceptions into error replies."""
         try:
-            conn.sendall(json.dumps(data).encode() + b'\n')
-        except OSError:
-            pass
+            return self._handle_command(cmd)
+        except Exception as e:
+            logging.error("IPC command failed: %s", e)
+            return {'status': 'error', 'message': str(e)}
 
     # ------------------------------------------------------------------
     # Command handling
@@ -170,6 +577,33 @@ class IPCServer:
                 return {'status': 'error', 'message': 'Missing module'}
             return self._reload_module(module_name)
 
+        if action == 'push':
+            module_name = cmd.get('module')
+            if not module_name:
+                return {'status': 'error', 'message': 'Missing module'}
+            return self._push(module_name, cmd.get('data'), cmd.get('ttl'))
+
+        if action == 'get':
+            return self._get_state(cmd.get('keys'), cmd.get('fields'))
+
+        if action == 'batch':
+            return self._batch(cmd.get('commands'))
+
+        if action == 'cache':
+            return self._cache_info()
+
+        if action == 'record':
+            return self._record(cmd.get('path'), cmd.get('stop', False))
+
+        if action == 'stats':
+            return self._stats(cmd.get('module'), cmd.get('reset', False))
+
+        if action == 'stalls':
+            return {
+                'status': 'ok',
+                **c.watchdog.stalls(clear=cmd.get('clear', False)),
+            }
+
         if action in ('tracemalloc', 'objcount'):
             if not c.state_manager.get('debug'):
                 return {
@@ -236,6 +670,150 @@ class IPCServer:
             'message': f"Module '{module_name}' not found or not running",
         }
 
+    def _push(self, module_name, data, ttl=None):
+        """Set a module's state from an external producer."""
+        from bar import SECTION_KEYS
+        config = self.display.config
+        if module_name not in config.get('modules', {}) and not any(
+                module_name in config.get(key, []) for key in SECTION_KEYS):
+            return {
+                'status': 'error',
+                'message': f"Module '{module_name}' is not configured",
+            }
+        if not isinstance(data, dict):
+            return {'status': 'error', 'message': 'data must be an object'}
+        if ttl is not None:
+            try:
+                ttl = float(ttl)
+            except (TypeError, ValueError):
+                return {'status': 'error', 'message': 'Invalid ttl'}
+
+        timer = self._push_timers.pop(module_name, None)
+        if timer is not None:
+            GLib.source_remove(timer)
+
+        data = dict(data)
+        data.pop('stale', None)
+        data['timestamp'] = time.time()
+        if ttl:
+            data['expires'] = data['timestamp'] + ttl
+            self._push_timers[module_name] = GLib.timeout_add(
+                max(1, int(ttl * 1000)), self._expire_push, module_name,
+                data['timestamp'])
+        c.state_manager.update(module_name, data)
+        # Cache it the way the module's own poll would. Never build an
+        # instance here; constructors may start processes.
+        module_config = config.get('modules', {}).get(module_name, {})
+        instance = mod._instances.get(module_name)
+        if instance is not None:
+            if getattr(instance, 'persist', False):
+                c.cache_writer.save(
+                    module_name, instance._without_transient(data),
+                    instance.CACHE_INTERVAL)
+        elif 'command' in module_config and not mod.is_hass_module(
+                module_name, module_config):
+            # Waybar-style command module: cached like CommandPoller
+            # output.
+            c.cache_writer.save(module_name, data)
+        return {'status': 'ok', 'module': module_name}
+
+    def _expire_push(self, module_name, timestamp):
+        """Mark pushed state stale once its TTL has run out."""
+        self._push_timers.pop(module_name, None)
+        current = c.state_manager.get(module_name)
+        # Leave it alone if a poll or another push replaced it.
+        if isinstance(current, dict) and not current.get('stale') \
+                and current.get('timestamp') == timestamp:
+            stale = dict(current)
+            stale['stale'] = True
+            c.state_manager.update(module_name, stale)
+        return False
+
+    def _get_state(self, keys=None, fields=None):
+        """Return current state for keys, optionally projected."""
+        if isinstance(keys, str):
+            keys = [keys]
+        if keys is None:
+            keys = sorted(c.state_manager.data)
+        if isinstance(fields, str):
+            fields = [fields]
+        state = {}
+        missing = []
+        for key in keys:
+            data = c.state_manager.get(key)
+            if data is None:
+                missing.append(key)
+                continue
+            state[key] = _project(data, fields) if fields else data
+        result = {'status': 'ok', 'state': state}
+        if missing:
+            result['missing'] = missing
+        return result
+
+    def _batch(self, commands):
+        """Run a list of commands in order and return every result."""
+        if not isinstance(commands, list):
+            return {'status': 'error', 'message': 'commands must be a list'}
+        results = []
+        for cmd in commands:
+            if not isinstance(cmd, dict):
+                results.append(
+                    {'status': 'error', 'message': 'Expected an object'})
+            elif cmd.get('action') in (
+                    'batch', 'subscribe', 'profile', 'replay'):
+                results.append({
+                    'status': 'error',
+                    'message': f"{cmd['action']} can't be batched",
+                })
+            else:
+                results.append(self._dispatch(cmd))
+        return {'status': 'ok', 'results': results}
+
+    def _record(self, path, stop=False):
+        """Start or stop recording the state update stream."""
+        from common.recording import recorder
+        if stop:
+            summary = recorder.stop()
+            if summary is None:
+                return {'status': 'error', 'message': 'Not recording'}
+            return {'status': 'ok', **summary}
+        if not path:
+            return {'status': 'error', 'message': 'Missing path'}
+        try:
+            path = recorder.start(path)
+        except OSError as e:
+            return {'status': 'error', 'message': str(e)}
+        return {'status': 'ok', 'path': path}
+
+    def _cache_info(self):
+        """Report cache store size and bytes stored per module."""
+        info = c.cache_writer.debug_info()
+        sizes = c.cache_writer.sizes()
+        return {
+            'status': 'ok',
+            'path': info['path'],
+            'file_bytes': info['file_bytes'],
+            'live_bytes': info['live_bytes'],
+            'dirty': info['dirty'],
+            'modules': dict(
+                sorted(sizes.items(), key=lambda kv: kv[1], reverse=True)),
+        }
+
+    def _stats(self, names=None, reset=False):
+        """Report per-module fetch/dispatch metrics and worker counts."""
+        if isinstance(names, str):
+            names = [names]
+        result = {
+            'status': 'ok',
+            'modules': c.metrics.snapshot(names),
+            'dispatch': c.state_manager.dispatch_stats(),
+            'scheduler': mod.scheduler.debug_info(),
+            'threads': threading.active_count(),
+        }
+        if reset:
+            c.metrics.reset()
+        return result
+
     def _object_counts(self, top=30):
         """Count live Python objects by type using gc."""
         import gc
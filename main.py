@@ -7,7 +7,14 @@ import os
 import sys
 import argparse
 import logging
-import version
+from startup_trace import tracer, TRACE_TIMEOUT
+
+# Checked before argparse so the argument parsing itself is traced.
+if '--trace-startup' in sys.argv:
+    tracer.enable()
+
+with tracer.span('import version'):
+    import version
 
 
 def parse_args():
@@ -34,14 +41,23 @@ def parse_args():
                         "(enables inspector and screenshots)")
     parser.add_argument('--clear-cache', action='store_true',
                         help="Clear cache directory contents on startup")
+    parser.add_argument('--trace-startup', action='store_true',
+                        help="Write a Chrome trace of startup to "
+                        "~/.cache/pybar/startup-trace.json")
+    parser.add_argument('--record-state', type=str, metavar='FILE',
+                        help="Record every module state update to FILE "
+                        "for replay")
+    with tracer.span('version.get_version'):
+        app_version = version.get_version()
     parser.add_argument('-v', '--version', action='version',
-                        version='%(prog)s ' + version.get_version())
+                        version='%(prog)s ' + app_version)
     args, unknown = parser.parse_known_args()
     return args
 
 
 # Parse early to set environment variables and log level
-args = parse_args()
+with tracer.span('parse_args'):
+    args = parse_args()
 
 # Reap child processes automatically so they never linger as zombies.
 # This covers both children inherited from a previous execv-based reload
@@ -84,15 +100,20 @@ except Exception:
 
 import threading
 import traceback
-import config as Config
-from bar import Display
-import common as c
+with tracer.span('import config'):
+    import config as Config
+with tracer.span('import bar'):
+    from bar import Display
+with tracer.span('import common'):
+    import common as c
+    from common.watchdog import DEFAULT_BUDGET_MS
 import module
 import gi
 gi.require_version('Gtk', '4.0')
 gi.require_version('Gtk4LayerShell', '1.0')
 gi.require_version('Adw', '1')
-from gi.repository import Gtk, Gio, Adw, GLib  # noqa
+with tracer.span('import gi'):
+    from gi.repository import Gtk, Gio, Adw, GLib  # noqa
 
 
 class StreamToLogger:
@@ -171,6 +192,19 @@ def setup_logging(app_level=logging.WARNING, gtk_level=logging.WARNING):
     return log_file
 
 
+def _dump_trace():
+    """ Write the startup trace even if some bar never painted """
+    tracer.dump()
+    return False
+
+
+def _on_quit_signal(app):
+    """ Quit cleanly on SIGTERM/SIGINT so shutdown handlers run """
+    logging.info("Received termination signal, quitting")
+    app.quit()
+    return GLib.SOURCE_REMOVE
+
+
 def on_activate(app, config):
     if hasattr(app, 'started') and app.started:
         return
@@ -186,18 +220,36 @@ def on_activate(app, config):
         config['modules-right']
     )
 
+    tracer.instant('activate')
+    if tracer.enabled:
+        # Write whatever was recorded if a bar never paints.
+        GLib.timeout_add_seconds(TRACE_TIMEOUT, _dump_trace)
+
+    # Read every module cache in one pass of the cache store (migrating
+    # old per-module files on first run). Each worker publishes its
+    # entry as it starts, so bars are drawn with cached content and no
+    # worker reads the cache again.
+    with tracer.span('cache load'):
+        cache = c.cache_writer.load_all(unique | set(config['modules']))
+
     # Start module threads
-    for name in unique:
-        # Load the module config if it exists
-        module_config = config['modules'].get(name, {})
+    with tracer.span('start workers'):
+        for name in unique:
+            # Load the module config if it exists
+            module_config = config['modules'].get(name, {})
 
-        # Start the worker thread for this module
-        module.start_worker(name, module_config)
+            # Start the worker thread for this module
+            module.start_worker(name, module_config, cache)
 
     try:
-        app.display = Display(config, app)
+        with tracer.span('Display'):
+            app.display = Display(config, app)
         # Draw all bars
-        app.display.draw_all()
+        with tracer.span('draw_all'):
+            app.display.draw_all()
+        # Deliver the cached state before the first frame is painted.
+        with tracer.span('initial dispatch'):
+            c.state_manager.flush()
     except Exception:
         logging.error("Failed to activate application", exc_info=True)
         sys.exit(1)
@@ -240,19 +292,33 @@ def main():
     if args.clear_cache:
         clear_cache('~/.cache/pybar')
 
-    log_file = setup_logging(app_log_level, gtk_log_level)
+    with tracer.span('setup_logging'):
+        log_file = setup_logging(app_log_level, gtk_log_level)
     logging.info(f"Starting pybar, logging to {log_file}")
 
     # Register bundled fonts
-    fonts_dir = c.get_resource_path('fonts')
-    if os.path.exists(fonts_dir):
-        c.register_fonts(fonts_dir)
+    with tracer.span('register_fonts'):
+        fonts_dir = c.get_resource_path('fonts')
+        if os.path.exists(fonts_dir):
+            c.register_fonts(fonts_dir)
+
+    with tracer.span('Config.load'):
+        config = Config.load(args.config)
+
+    # Time every idle/timeout callback on the GTK thread from here on.
+    c.watchdog.set_budget(
+        config.get('stall-budget', DEFAULT_BUDGET_MS))
+    c.watchdog.install()
 
-    config = Config.load(args.config)
     c.state_manager.update('config', config)
     c.state_manager.update('config_path', args.config)
     c.state_manager.update('debug', args.debug)
 
+    if args.record_state:
+        from common.recording import recorder
+        logging.info(
+            f"Recording state updates to {recorder.start(args.record_state)}")
+
     # Set the cache directory if it's not specified in the config
     if "cache" not in list(config):
         config["cache"] = '~/.cache/pybar'
@@ -271,6 +337,12 @@ def main():
     app.config_path = args.config  # Store config path for settings window
     app.connect('activate', lambda app: on_activate(app, config))
 
+    # Logout or pkill: go through the 'shutdown' handler so caches are
+    # flushed, instead of dying with write-behind data pending.
+    for signum in (_signal.SIGTERM, _signal.SIGINT):
+        GLib.unix_signal_add(
+            GLib.PRIORITY_DEFAULT, signum, _on_quit_signal, app)
+
     # Use an empty list for argv to prevent GTK from parsing custom args
     app.run([])
 
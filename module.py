@@ -5,6 +5,8 @@ Author: thnikk
 """
 
 import importlib
+import math
+import queue
 import threading
 from subprocess import run, CalledProcessError
 import json
@@ -13,6 +15,8 @@ import time
 from datetime import datetime
 import gi
 import common as c
+from common.manifest import manifest
+from startup_trace import tracer
 
 gi.require_version("Gtk", "4.0")
 from gi.repository import Gtk, Gdk, GLib  # noqa
@@ -28,6 +32,235 @@ _worker_threads = {}
 _worker_stop_flags = {}
 _worker_wake_flags = {}
 
+# Scheduler resolution: polls are rounded up to multiples of TICK seconds
+# so that modules with similar intervals wake together.
+SCHEDULER_TICK = 0.5
+SCHEDULER_SLOTS = 256
+SCHEDULER_WORKERS = max(2, min(6, os.cpu_count() or 2))
+
+
+class _Job:
+    """A scheduled poll; poll(first_run) returns the next delay or None."""
+
+    __slots__ = (
+        "name", "poll", "tick", "first_run", "running",
+        "wake_pending", "cancelled", "idle",
+    )
+
+    def __init__(self, name, poll):
+        self.name = name
+        self.poll = poll
+        self.tick = None
+        self.first_run = True
+        self.running = False
+        self.wake_pending = False
+        self.cancelled = False
+        self.idle = threading.Event()
+        self.idle.set()
+
+
+class Scheduler:
+    """
+    Hashed timer wheel feeding a bounded pool of worker threads.
+
+    One timer thread sleeps until the next occupied tick and hands due
+    jobs to the pool, so the thread count stays flat no matter how many
+    polling modules are configured. A job never runs concurrently with
+    itself; waking a running job re-queues it as soon as it finishes.
+    """
+
+    def __init__(self, tick=SCHEDULER_TICK, slots=SCHEDULER_SLOTS,
+                 workers=SCHEDULER_WORKERS):
+        self.tick = tick
+        self.slots = [set() for _ in range(slots)]
+        self.workers = workers
+        self._jobs = {}
+        self._cond = threading.Condition()
+        self._queue = queue.Queue()
+        self._threads = []
+        self._cursor = self._tick_now()
+        # thread ident -> name of the job that thread is polling
+        self._active = {}
+
+    def _tick_now(self):
+        """Return the current absolute tick number."""
+        return int(time.monotonic() / self.tick)
+
+    def _ensure_started(self):
+        """Start the timer and pool threads on first use."""
+        if self._threads:
+            return
+        timer = threading.Thread(
+            target=self._timer_loop, name="pybar-scheduler", daemon=True)
+        self._threads.append(timer)
+        for i in range(self.workers):
+            self._threads.append(threading.Thread(
+                target=self._pool_loop, name=f"pybar-worker-{i}",
+                daemon=True))
+        for thread in self._threads:
+            thread.start()
+
+    def _place(self, job, delay):
+        """Put job in the wheel at the first tick boundary after delay."""
+        due = (time.monotonic() + delay) / self.tick
+        # Dispatch latency lands every job slightly past its boundary;
+        # tolerate that so intervals don't drift by a whole tick.
+        job.tick = max(math.ceil(due - 0.1), self._cursor)
+        self.slots[job.tick % len(self.slots)].add(job)
+
+    def _unplace(self, job):
+        """Remove job from the wheel if it is waiting there."""
+        if job.tick is not None:
+            self.slots[job.tick % len(self.slots)].discard(job)
+            job.tick = None
+
+    def _submit(self, job):
+        """Hand job to the pool; caller holds the lock."""
+        self._unplace(job)
+        job.running = True
+        job.idle.clear()
+        self._queue.put(job)
+
+    def _next_due(self):
+        """Return the first tick holding a due job, or None if idle."""
+        size = len(self.slots)
+        for offset in range(size):
+            tick = self._cursor + offset
+            for job in self.slots[tick % size]:
+                if job.tick <= tick:
+                    return tick
+        # Nothing due within one revolution; jobs with longer delays
+        # still sit in the wheel, so wait for the nearest of them.
+        return min(
+            (job.tick for slot in self.slots for job in slot), default=None)
+
+    def _timer_loop(self):
+        """Sleep until the next occupied tick and dispatch due jobs."""
+        size = len(self.slots)
+        with self._cond:
+            while True:
+                now = self._tick_now()
+                # Catch up on every tick since the last pass (bounded by
+                # one revolution, which already covers every slot).
+                start = max(self._cursor, now - size + 1)
+                for tick in range(start, now + 1):
+                    for job in list(self.slots[tick % size]):
+                        if job.tick <= now:
+                            self._submit(job)
+                self._cursor = now + 1
+
+                due = self._next_due()
+                if due is None:
+                    self._cond.wait()
+                else:
+                    self._cond.wait(
+                        max(0, due * self.tick - time.monotonic()))
+
+    def _pool_loop(self):
+        """Run queued jobs and reschedule them."""
+        while True:
+            job = self._queue.get()
+            delay = None
+            ident = threading.get_ident()
+            self._active[ident] = job.name
+            try:
+                delay = job.poll(job.first_run)
+            except Exception as e:
+                c.print_debug(
+                    f"Scheduled poll for {job.name} failed: {e}",
+                    color="red")
+            finally:
+                self._active.pop(ident, None)
+            with self._cond:
+                job.first_run = False
+                job.running = False
+                if job.cancelled or self._jobs.get(job.name) is not job:
+                    job.idle.set()
+                    continue
+                if job.wake_pending:
+                    job.wake_pending = False
+                    self._submit(job)
+                    continue
+                job.idle.set()
+                if delay is None:
+                    del self._jobs[job.name]
+                    continue
+                self._place(job, delay)
+                self._cond.notify()
+
+    def add(self, name, poll):
+        """Schedule poll to run now and then at the delays it returns."""
+        self.remove(name)
+        job = _Job(name, poll)
+        with self._cond:
+            self._ensure_started()
+            self._jobs[name] = job
+            self._submit(job)
+
+    def wake(self, name):
+        """Run a job as soon as possible; returns False if unknown."""
+        with self._cond:
+            job = self._jobs.get(name)
+            if job is None:
+                return False
+            if job.running:
+                job.wake_pending = True
+            else:
+                self._submit(job)
+            return True
+
+    def remove(self, name, timeout=1.0):
+        """Cancel a job, waiting up to timeout for a running poll."""
+        with self._cond:
+            job = self._jobs.pop(name, None)
+            if job is None:
+                return False
+            job.cancelled = True
+            self._unplace(job)
+        if timeout:
+            job.idle.wait(timeout)
+        return True
+
+    def remove_all(self, timeout=0.1):
+        """Cancel every job without waiting on each one in turn."""
+        with self._cond:
+            jobs = list(self._jobs.values())
+            self._jobs.clear()
+            for job in jobs:
+                job.cancelled = True
+                self._unplace(job)
+        deadline = time.monotonic() + timeout
+        for job in jobs:
+            job.idle.wait(max(0, deadline - time.monotonic()))
+
+    def __contains__(self, name):
+        return name in self._jobs
+
+    def active_jobs(self):
+        """Return {thread ident: job name} for polls in progress."""
+        return dict(self._active)
+
+    def debug_info(self):
+        """Return job and thread counts."""
+        with self._cond:
+            return {
+                "jobs": len(self._jobs),
+                "running": sum(j.running for j in self._jobs.values()),
+                "queued": self._queue.qsize(),
+                "threads": len(self._threads),
+            }
+
+
+scheduler = Scheduler()
+
+
+def _is_pollable(instance):
+    """True if instance uses the stock BaseModule poll loop."""
+    return (
+        type(instance).run_worker is c.BaseModule.run_worker
+        and hasattr(instance, "poll")
+    )
+
 
 def discover_modules():
     """Discover available module files without importing them"""
@@ -47,6 +280,9 @@ def discover_modules():
         module_name = filename[:-3]
         _discovered_files[module_name] = filename
 
+    # Types, aliases and schemas from source, without importing.
+    manifest.load(modules_dir)
+
     _discovery_done = True
 
 
@@ -56,7 +292,8 @@ def _import_module(module_name):
         return module_name in _imported_modules
 
     try:
-        mod = importlib.import_module(f"modules.{module_name}")
+        with tracer.span(f"import modules.{module_name}", cat="import"):
+            mod = importlib.import_module(f"modules.{module_name}")
         m_map = getattr(mod, "module_map", {})
         a_map = getattr(mod, "alias_map", {})
 
@@ -79,6 +316,29 @@ def _import_module(module_name):
     return False
 
 
+def _find_class(module_type):
+    """Return the class for a type or alias, importing only its file"""
+    if not _discovery_done:
+        discover_modules()
+
+    cls = _module_map.get(module_type) or _alias_map.get(module_type)
+    if cls:
+        return cls
+
+    # The manifest names the one file to import; only files whose maps
+    # are computed at import time have to be tried blindly.
+    mod_name = manifest.file_for(module_type)
+    candidates = [mod_name] if mod_name else manifest.dynamic_files()
+    for mod_name in candidates:
+        if mod_name in _imported_modules:
+            continue
+        _import_module(mod_name)
+        cls = _module_map.get(module_type) or _alias_map.get(module_type)
+        if cls:
+            return cls
+    return None
+
+
 def resolve_type(module_type):
     """Resolve an alias to its canonical module type"""
     if module_type in _canonical_map:
@@ -87,18 +347,18 @@ def resolve_type(module_type):
     if not _discovery_done:
         discover_modules()
 
-    # If not found in maps, try importing by name first
-    if module_type in _discovered_files:
-        _import_module(module_type)
-        if module_type in _canonical_map:
-            return _canonical_map[module_type]
+    canonical = manifest.canonical(module_type)
+    if canonical:
+        return canonical
 
-    # If still not found, it might be an alias in an unimported file
-    for mod_name in list(_discovered_files.keys()):
-        if mod_name not in _imported_modules:
-            _import_module(mod_name)
-            if module_type in _canonical_map:
-                return _canonical_map[module_type]
+    # Unknown to the manifest: it can only be an alias in a file whose
+    # maps are computed at import time.
+    if manifest.file_for(module_type) is None:
+        for mod_name in manifest.dynamic_files():
+            if mod_name not in _imported_modules:
+                _import_module(mod_name)
+                if module_type in _canonical_map:
+                    return _canonical_map[module_type]
 
     return _canonical_map.get(module_type, module_type)
 
@@ -109,28 +369,7 @@ def get_instance(name, config):
     if name in _instances:
         return _instances[name]
 
-    if not _discovery_done:
-        discover_modules()
-
-    module_type = config.get("type", name)
-
-    # Try to get class from already loaded maps
-    cls = _module_map.get(module_type) or _alias_map.get(module_type)
-
-    # If not found, try importing by name
-    if not cls and module_type in _discovered_files:
-        if _import_module(module_type):
-            cls = _module_map.get(module_type) or _alias_map.get(module_type)
-
-    # If still not found, it might be an alias in an unimported file
-    if not cls:
-        for mod_name in list(_discovered_files.keys()):
-            if mod_name not in _imported_modules:
-                _import_module(mod_name)
-                cls = _module_map.get(module_type) or _alias_map.get(module_type)
-                if cls:
-                    break
-
+    cls = _find_class(config.get("type", name))
     if not cls:
         return None
 
@@ -143,62 +382,76 @@ def get_available_module_names():
     """Get a list of all available module names (including not yet loaded)"""
     if not _discovery_done:
         discover_modules()
-    return sorted(set(list(_module_map.keys()) + list(_discovered_files.keys())))
+    return sorted(
+        set(manifest.module_types())
+        | set(_module_map.keys())
+        | set(_discovered_files.keys())
+    )
 
 
 def get_module_class(module_type):
     """Get the class for a module type, loading it if necessary"""
-    if not _discovery_done:
-        discover_modules()
+    return _find_class(module_type)
 
-    cls = _module_map.get(module_type) or _alias_map.get(module_type)
-    if cls:
-        return cls
 
-    if module_type in _discovered_files:
-        _import_module(module_type)
-        cls = _module_map.get(module_type) or _alias_map.get(module_type)
-        if cls:
-            return cls
+def get_module_schema(module_type):
+    """Get the SCHEMA for a module type, or None if the type is unknown"""
+    if not _discovery_done:
+        discover_modules()
+    schema = manifest.schema(module_type)
+    if schema is not None:
+        return schema
+    cls = _find_class(module_type)
+    if cls is None:
+        return None
+    return getattr(cls, "SCHEMA", {})
 
-    # Try all modules for alias
-    for mod_name in list(_discovered_files.keys()):
-        if mod_name not in _imported_modules:
-            _import_module(mod_name)
-            cls = _module_map.get(module_type) or _alias_map.get(module_type)
-            if cls:
-                return cls
 
-    return None
+def start_worker(name, config, cache=None):
+    """
+    Start background work for a module.
 
+    Modules using the stock poll loop (and waybar-style command modules)
+    are driven by the shared scheduler; modules with their own event
+    loop in run_worker still get a dedicated thread.
 
-def start_worker(name, config):
-    """Start a background worker for a module"""
+    cache is the result of cache_writer.load_all() when starting up; the
+    module's entry is published right away instead of being read again
+    by the first poll.
+    """
     # Stop existing worker if any
     stop_worker(name)
 
-    # Create stop and wake flags
-    _worker_stop_flags[name] = threading.Event()
-    _worker_wake_flags[name] = threading.Event()
-
     instance = get_instance(name, config)
+    if instance and _is_pollable(instance):
+        if cache is not None:
+            instance.prime(cache.get(name))
+        scheduler.add(name, instance.poll)
+        return
+
     if instance:
-        thread = threading.Thread(target=instance.run_worker, daemon=True)
+        # Create stop and wake flags
+        _worker_stop_flags[name] = threading.Event()
+        _worker_wake_flags[name] = threading.Event()
+        thread = threading.Thread(
+            target=instance.run_worker, name=f"pybar-{name}", daemon=True)
         _worker_threads[name] = thread
         thread.start()
         return
 
     # Fallback for waybar-style command modules
     if "command" in config:
-        thread = threading.Thread(
-            target=command_worker, args=(name, config), daemon=True
-        )
-        _worker_threads[name] = thread
-        thread.start()
+        poller = CommandPoller(name, config)
+        if cache is not None:
+            poller.prime(cache.get(name))
+        scheduler.add(name, poller.poll)
 
 
 def force_update(name):
     """Force a module to update immediately by waking its worker"""
+    if scheduler.wake(name):
+        c.print_debug(f"Forcing update for {name}", color="green")
+        return True
     if name in _worker_wake_flags:
         c.print_debug(f"Forcing update for {name}", color="green")
         _worker_wake_flags[name].set()
@@ -208,7 +461,8 @@ def force_update(name):
 
 
 def stop_worker(name):
-    """Stop a specific worker thread"""
+    """Stop a specific worker thread or scheduled job"""
+    scheduler.remove(name)
     if name in _worker_stop_flags:
         _worker_stop_flags[name].set()
     if name in _worker_wake_flags:
@@ -226,7 +480,12 @@ def stop_worker(name):
 
 
 def stop_all_workers():
-    """Stop all worker threads in parallel"""
+    """Stop all worker threads and scheduled jobs in parallel"""
+    scheduler.remove_all()
+    # Close a state recording so the file ends cleanly.
+    if c.state_manager.recorder is not None:
+        c.state_manager.recorder.stop()
+
     # Signal all to stop first
     for name in list(_worker_stop_flags.keys()):
         _worker_stop_flags[name].set()
@@ -244,6 +503,11 @@ def stop_all_workers():
         if name in _worker_wake_flags:
             del _worker_wake_flags[name]
 
+    # Persist whatever the write-behind cache is still holding, now that
+    # workers have stopped. A poll that outlived the join timeout still
+    # gets its save() written, since the writer is closed.
+    c.cache_writer.close()
+
     # Force cleanup of Volume/Pulse threads that might hang
     # (Note: we can't easily kill threads in Python, but we can try to
     # unblock them if they are in a known blocking call, or rely on them
@@ -251,6 +515,22 @@ def stop_all_workers():
     # an external event)
 
 
+def remove_instance(name):
+    """Stop a module's worker and drop its instance so it can be rebuilt"""
+    stop_worker(name)
+    instance = _instances.pop(name, None)
+    if instance is None:
+        return False
+    if hasattr(instance, "_unregister_subscription"):
+        instance._unregister_subscription()
+    if hasattr(instance, "cleanup"):
+        try:
+            instance.cleanup()
+        except Exception as e:
+            c.print_debug(f"Failed to cleanup {name}: {e}", color="red")
+    return True
+
+
 def clear_instances():
     """Clear all module instances for reload in parallel"""
     global \
@@ -294,6 +574,8 @@ def clear_instances():
     _canonical_map = {}
     _imported_modules = set()
     _discovery_done = False
+    # Rescan any module files that changed before the next import.
+    manifest.invalidate()
 
     # Remove all dynamically loaded modules from sys.modules
     modules_to_remove = [
@@ -309,80 +591,85 @@ def clear_instances():
     )
 
 
-def command_worker(name, config):
-    """Worker for waybar-style command modules"""
-    stop_event = _worker_stop_flags.get(name)
-    wake_event = _worker_wake_flags.get(name)
-    interval = config.get("interval", 60)
+def is_hass_module(name, config):
+    """Return True for Home Assistant modules, which are never cached"""
     module_type = resolve_type(config.get("type", name))
-    is_hass = (
+    return (
         module_type.startswith("hass")
         or module_type.startswith("homeassistant")
         or name.startswith("hass")
     )
-    cache_path = os.path.expanduser(f"~/.cache/pybar/{name}.json")
 
-    last_data = None
-    first_run = True
-    while True:
+
+class CommandPoller:
+    """Poll state for waybar-style command modules"""
+
+    def __init__(self, name, config):
+        self.name = name
+        self.config = config
+        self.interval = config.get("interval", 60)
+        self.is_hass = is_hass_module(name, config)
+        self.last_data = None
+        self.primed = False
+
+    def restore_cache(self, cached):
+        """Publish cached output, marked stale, as the initial state"""
+        if not cached:
+            return
+        self.last_data = cached
+        stale_init = cached.copy()
+        stale_init["stale"] = True
+        stale_init["timestamp"] = datetime.now().timestamp()
+        c.state_manager.update(self.name, stale_init)
+
+    def prime(self, cached):
+        """Restore the cache at startup instead of on the first poll"""
+        self.primed = True
+        if not self.is_hass:
+            self.restore_cache(cached)
+
+    def poll(self, first_run=False):
+        """Run the command once and publish its JSON output"""
+        name = self.name
         data = None
 
-        if first_run and not is_hass and os.path.exists(cache_path):
+        if first_run and not self.is_hass and not self.primed:
             try:
-                with open(cache_path, "r") as f:
-                    cached = json.load(f)
-                if cached:
-                    last_data = cached
-                    stale_init = cached.copy()
-                    stale_init["stale"] = True
-                    stale_init["timestamp"] = datetime.now().timestamp()
-                    c.state_manager.update(name, stale_init)
+                self.restore_cache(c.cache_writer.load(name))
             except Exception:
                 pass
 
-        command = [os.path.expanduser(arg) for arg in config["command"]]
+        command = [os.path.expanduser(arg) for arg in self.config["command"]]
+        fresh = False
+        outcome = "success"
+        start_time = time.time()
         try:
             output = run(command, check=True, capture_output=True).stdout.decode()
             new_data = json.loads(output)
             if new_data:
                 data = new_data
-                last_data = data
-                if not is_hass:
-                    try:
-                        os.makedirs(os.path.dirname(cache_path), exist_ok=True)
-                        with open(cache_path, "w") as f:
-                            json.dump(data, f)
-                    except Exception:
-                        pass
+                self.last_data = data
+                fresh = True
             else:
-                if last_data:
-                    data = last_data.copy()
+                outcome = "empty"
+                if self.last_data:
+                    data = self.last_data.copy()
                     data["stale"] = True
         except Exception:
-            if last_data:
-                data = last_data.copy()
+            outcome = "exception"
+            if self.last_data:
+                data = self.last_data.copy()
                 data["stale"] = True
+        c.metrics.record_fetch(name, outcome, time.time() - start_time)
 
         if data:
             if isinstance(data, dict):
                 data["timestamp"] = datetime.now().timestamp()
             c.state_manager.update(name, data)
+            if fresh and not self.is_hass:
+                c.cache_writer.save(name, data)
 
-        first_run = False
-        # Check for stop or wake signals
-        if stop_event:
-            if wake_event:
-                # Wait for stop, wake, or timeout
-                woken = wake_event.wait(timeout=interval)
-                if stop_event.is_set():
-                    break
-                if woken:
-                    wake_event.clear()  # Clear flag and continue
-            else:
-                if stop_event.wait(timeout=interval):
-                    break
-        else:
-            time.sleep(interval)
+        return self.interval
 
 
 def module(bar, name, config):
@@ -391,7 +678,8 @@ def module(bar, name, config):
     instance = get_instance(name, module_config)
 
     if instance:
-        return instance.create_widget(bar)
+        with tracer.span(f"create_widget {name}", cat="widget"):
+            return instance.create_widget(bar)
 
     # Waybar-style command fallback
     if "command" in module_config:
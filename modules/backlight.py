@@ -14,6 +14,8 @@ from gi.repository import Gtk, GLib  # noqa
 
 
 class Backlight(c.BaseModule):
+    DISPATCH_PRIORITY = 20  # Slider and scroll feedback
+
     SCHEMA = {
         'device': {
             'type': 'string',
@@ -18,28 +18,21 @@ from gi.repository import Gtk, GLib  # noqa
 
 
 # Path for per-source event cache
-_EVENTS_CACHE_PATH = os.path.expanduser("~/.cache/pybar/clock_events.json")
+_EVENTS_CACHE_KEY = "clock_events"
 
 
 def _load_events_cache():
-    """Load the per-source event cache from disk."""
+    """Load the per-source event cache from the cache store."""
     try:
-        if os.path.exists(_EVENTS_CACHE_PATH):
-            with open(_EVENTS_CACHE_PATH, "r", encoding="utf-8") as f:
-                return json.load(f)
+        return c.cache_writer.load(_EVENTS_CACHE_KEY) or {}
     except Exception as e:
         c.print_debug(f"Failed to load event cache: {e}", color="red")
     return {}
 
 
 def _save_events_cache(cache):
-    """Persist the per-source event cache to disk."""
-    try:
-        os.makedirs(os.path.dirname(_EVENTS_CACHE_PATH), exist_ok=True)
-        with open(_EVENTS_CACHE_PATH, "w", encoding="utf-8") as f:
-            json.dump(cache, f)
-    except Exception as e:
-        c.print_debug(f"Failed to save event cache: {e}", color="red")
+    """Persist the per-source event cache to the cache store."""
+    c.cache_writer.save(_EVENTS_CACHE_KEY, cache, interval=0)
 
 
 def _resolve_password(source):
@@ -233,6 +226,7 @@ def _load_credentials(config_path):
 class Clock(c.BaseModule):
     DEFAULT_INTERVAL = 1
     EMPTY_IS_ERROR = False
+    PERSIST = False  # The time is never worth restoring
 
     SCHEMA = {
         "format": {
@@ -5,15 +5,17 @@ Author: thnikk
 """
 from collections import deque
 import common as c
-import psutil
 import gi
 import colorsys
 gi.require_version('Gtk', '4.0')
 from gi.repository import Gtk  # noqa
+psutil = c.lazy_import('psutil')
 
 
 class CPU(c.BaseModule):
     DEFAULT_INTERVAL = 2
+    # Rolling graphs are rebuilt in memory; total/per_cpu carry the change.
+    TRANSIENT_FIELDS = ('history', 'per_cpu_history')
     SCHEMA = {
         'interval': {
             'type': 'integer',
@@ -3,11 +3,12 @@
 Description: Waybar-compatible custom module for executing external scripts
 Author: thnikk
 """
-from gi.repository import Gtk, Pango
+from gi.repository import Gtk, Pango, GLib
 import common as c
 from subprocess import run, CalledProcessError, TimeoutExpired, Popen
 import json
 import os
+import time
 import shlex
 import gi
 gi.require_version('Gtk', '4.0')
@@ -401,7 +402,8 @@ class CustomModule(c.BaseModule):
             'default': '',
             'label': 'Executable Script',
             'description': 'Path to script or command to execute '
-                           '(supports arguments and quotes)'
+                           '(supports arguments and quotes). Leave '
+                           'empty to only receive state over IPC push'
         },
         'return-type': {
             'type': 'choice',
@@ -431,6 +433,43 @@ class CustomModule(c.BaseModule):
         }
     }
 
+    def restore_cache(self, cached):
+        """Restore cached output, or the last push if push-only"""
+        if self.config.get('exec'):
+            return super().restore_cache(cached)
+        # Pushed state is stale once its TTL ran out, not by interval.
+        if cached:
+            cached = cached.copy()
+            expires = cached.get('expires')
+            if expires and expires < time.time():
+                cached['stale'] = True
+            elif expires:
+                GLib.timeout_add(
+                    max(1, int((expires - time.time()) * 1000)),
+                    self._expire_restored, cached.get('timestamp'))
+            c.state_manager.update(self.name, cached)
+        return None
+
+    def _expire_restored(self, timestamp):
+        """Mark restored pushed state stale once its TTL runs out"""
+        current = c.state_manager.get(self.name)
+        # Leave it alone if a newer push replaced it.
+        if isinstance(current, dict) and not current.get('stale') \
+                and current.get('timestamp') == timestamp:
+            stale = dict(current)
+            stale['stale'] = True
+            c.state_manager.update(self.name, stale)
+        return False
+
+    def poll(self, first_run=False):
+        """Poll the script, or restore pushed state if there is none"""
+        if self.config.get('exec'):
+            return super().poll(first_run)
+        # Push-only: state arrives over IPC, so never poll.
+        if first_run and self.persist and not self._primed:
+            self.restore_cache(c.cache_writer.load(self.name))
+        return None
+
     def fetch_data(self):
         """Execute script and parse output"""
         exec_cmd = self.config.get('exec', '')
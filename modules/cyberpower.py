@@ -3,12 +3,12 @@
 Description: CyberPower UPS module refactored for unified state
 Author: thnikk
 """
-import hid
 import weakref
 import common as c
 import gi
 gi.require_version('Gtk', '4.0')
 from gi.repository import Gtk  # noqa
+hid = c.lazy_import('hid')
 
 
 class CyberPower:
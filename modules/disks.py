@@ -4,10 +4,10 @@ Description: Disk module showing combined and per-partition usage
 Author: thnikk
 """
 import common as c
-import psutil
 import gi
 gi.require_version('Gtk', '4.0')
 from gi.repository import Gtk  # noqa
+psutil = c.lazy_import('psutil')
 
 
 class Disks(c.BaseModule):
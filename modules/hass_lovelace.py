@@ -4,20 +4,18 @@ Description: Home Assistant module that generates UI from a Lovelace dashboard
 Author: thnikk
 """
 
-import json
-import os
 import weakref
-import requests
 import common as c
 import gi
 import asyncio
-import aiohttp
 import logging
 
 logging.getLogger("asyncio").setLevel(logging.WARNING)
 
 gi.require_version("Gtk", "4.0")
 from gi.repository import Gtk  # noqa
+requests = c.lazy_import("requests")
+aiohttp = c.lazy_import("aiohttp")
 
 
 class HASSLovelace(c.BaseModule):
@@ -57,30 +55,22 @@ class HASSLovelace(c.BaseModule):
     # --- Pin helpers ---------------------------------------------------
 
     @property
-    def _pin_cache_path(self):
-        """Path to the JSON file that persists the pinned entity ID."""
-        return os.path.expanduser(
-            f"~/.cache/pybar/{self.name}_pin.json"
-        )
+    def _pin_cache_key(self):
+        """Cache store key that persists the pinned entity ID."""
+        return f"{self.name}_pin"
 
     def _load_pinned(self):
         """Return the pinned entity ID, or None if nothing is pinned."""
         try:
-            with open(self._pin_cache_path) as f:
-                return json.load(f).get("pinned_eid")
+            return (c.cache_writer.load(self._pin_cache_key) or {}).get(
+                "pinned_eid")
         except Exception:
             return None
 
     def _save_pinned(self, eid):
         """Persist the pinned entity ID (pass None to clear)."""
-        try:
-            os.makedirs(
-                os.path.dirname(self._pin_cache_path), exist_ok=True
-            )
-            with open(self._pin_cache_path, "w") as f:
-                json.dump({"pinned_eid": eid}, f)
-        except Exception:
-            pass
+        c.cache_writer.save(
+            self._pin_cache_key, {"pinned_eid": eid}, interval=0)
 
     def _format_pinned_label(self, states, eid):
         """
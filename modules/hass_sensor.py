@@ -3,12 +3,12 @@
 Description: Home Assistant module refactored for unified state
 Author: thnikk
 """
-import requests
 import time
 import common as c
 import gi
 gi.require_version('Gtk', '4.0')
 from gi.repository import Gtk  # noqa
+requests = c.lazy_import('requests')
 
 HISTORY = {}
 
@@ -24,6 +24,9 @@ def format_duration(seconds):
 
 
 class HASS(c.BaseModule):
+    # Grows on every poll; the sensor state carries the change.
+    TRANSIENT_FIELDS = ('history',)
+
     SCHEMA = {
         'server': {
             'type': 'string',
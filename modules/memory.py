@@ -4,10 +4,10 @@ Description: Memory module with grouping and colorized process breakdown
 Author: thnikk
 """
 import common as c
-import psutil
 import gi
 gi.require_version('Gtk', '4.0')
 from gi.repository import Gtk  # noqa
+psutil = c.lazy_import('psutil')
 
 
 class MemoryBar(c.PillBar):
@@ -3,15 +3,12 @@
 Description: Mode module for Sway modes and Hyprland submaps
 Author: thnikk
 """
-from subprocess import Popen, PIPE, STDOUT
-import json
-import os
-import socket
 import common as c
 
 
 class Mode(c.BaseModule):
     DEFAULT_INTERVAL = 0  # Event-based module
+    DISPATCH_PRIORITY = 10  # Direct feedback for keybindings
 
     SCHEMA = {
         'format': {
@@ -23,120 +20,50 @@ class Mode(c.BaseModule):
     }
 
     def run_worker(self):
-        """ Listen for mode changes based on active WM """
-        wm = self._detect_wm()
+        """ Listen for mode changes on the shared compositor bus """
+        import module
+        wm = c.compositor.wm
         c.print_debug(f"Mode module detected WM: {wm}")
 
         # Initial state: hidden
         c.state_manager.update(self.name, {"text": "", "class": "mode"})
 
-        if wm == 'sway':
-            self._run_sway()
-        elif wm == 'hyprland':
-            self._run_hyprland()
-
-    def _detect_wm(self):
-        if os.getenv('HYPRLAND_INSTANCE_SIGNATURE'):
-            return 'hyprland'
-        try:
-            from subprocess import run, DEVNULL
-            run(['swaymsg', '-q'], check=True, stdout=DEVNULL, stderr=DEVNULL)
-            return 'sway'
-        except Exception:
-            return 'unknown'
-
-    def _run_sway(self):
-        while True:
-            try:
-                with Popen(
-                        ['swaymsg', '-t', 'subscribe', '["mode"]', '-m'],
-                        stdout=PIPE, stderr=STDOUT, text=True) as p:
-                    if p.stdout:
-                        for line in p.stdout:
-                            try:
-                                data = json.loads(line)
-                                mode = data.get('change', 'default')
-                                self._update_mode(mode)
-                            except (json.JSONDecodeError, KeyError):
-                                continue
-            except Exception as e:
-                c.print_debug(f"Sway mode listener error: {e}", color='red')
-                import time
-                time.sleep(5)
-
-    def _run_hyprland(self):
-        signature = os.getenv('HYPRLAND_INSTANCE_SIGNATURE')
-        if not signature:
-            return
-
-        # Check common socket locations
-        runtime_dir = os.getenv('XDG_RUNTIME_DIR')
-        socket_paths = [
-            f"/tmp/hypr/{signature}/.socket2.sock",
-            f"{runtime_dir}/hypr/{signature}/.socket2.sock"
-        ]
-
-        socket_path = None
-        for path in socket_paths:
-            if os.path.exists(path):
-                socket_path = path
-                break
-
-        if not socket_path:
-            c.print_debug("Hyprland socket2 not found", color='red')
+        if wm is None:
             return
-
-        while True:
-            try:
-                with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as s:
-                    s.connect(socket_path)
-                    # Sync current submap state on connect so the widget
-                    # reflects reality immediately rather than waiting
-                    # for the next event (e.g. after wake from sleep).
-                    self._sync_hyprland_submap(socket_path)
-                    while True:
-                        data = s.recv(4096).decode('utf-8')
-                        if not data:
-                            break
-                        for line in data.split('\n'):
-                            if line.startswith('submap>>'):
-                                mode = line.split('>>')[1]
-                                # Hyprland sends empty string by default
-                                if not mode:
-                                    mode = 'default'
-                                self._update_mode(mode)
-            except Exception as e:
-                c.print_debug(
-                    f"Hyprland mode listener error: {e}", color='red')
-                import time
-                time.sleep(5)
-
-    def _sync_hyprland_submap(self, socket2_path):
-        """ Query the active submap via socket1 and apply it. """
-        # Derive socket1 path from socket2 path
-        socket1_path = socket2_path.replace(
-            '.socket2.sock', '.socket.sock')
+        sub_id = c.compositor.subscribe(self._on_event, ('mode', 'submap'))
+        stop_event = module._worker_stop_flags.get(self.name)
+        if stop_event:
+            stop_event.wait()
+            c.compositor.unsubscribe(sub_id)
+
+    def _on_event(self, event, payload):
+        """ Apply a mode event, or resync after (re)connecting """
+        if event == 'connected':
+            self._sync_mode()
+        elif event == 'mode':
+            self._update_mode(payload.get('change', 'default'))
+        elif event == 'submap':
+            # Hyprland sends an empty name for the default submap
+            self._update_mode(payload or 'default')
+
+    def _sync_mode(self):
+        """
+        Query the active mode so the widget reflects reality immediately
+        rather than waiting for the next event (e.g. after wake from
+        sleep).
+        """
+        client = c.compositor.client
         try:
-            with socket.socket(
-                    socket.AF_UNIX, socket.SOCK_STREAM) as s:
-                s.connect(socket1_path)
-                # Socket1 protocol: null-terminated command string.
+            if c.compositor.wm == 'sway':
+                mode = client.get_binding_state().get('name')
+            else:
                 # 'submap' returns the active submap as plain text.
-                s.sendall(b'submap\0')
-                chunks = []
-                while True:
-                    chunk = s.recv(4096)
-                    if not chunk:
-                        break
-                    chunks.append(chunk)
-                raw = b''.join(chunks).decode('utf-8').strip()
-                mode = raw if raw else 'default'
-                self._update_mode(mode)
-        except Exception as e:
+                mode = client.request('submap', as_json=False)
+        except (c.CompositorError, AttributeError) as e:
             c.print_debug(
-                f"Failed to sync Hyprland submap: {e}",
-                color='yellow')
-            self._update_mode('default')
+                f"Failed to sync mode: {e}", color='yellow')
+            mode = 'default'
+        self._update_mode(mode or 'default')
 
     def _update_mode(self, mode):
         fmt = self.config.get('format', '{}')
@@ -10,7 +10,6 @@ import hashlib
 import math
 import random
 import cairo
-import requests
 import time
 from dasbus.connection import SessionMessageBus
 from dasbus.client.observer import DBusObserver
@@ -19,6 +18,7 @@ import gi
 gi.require_version('Gtk', '4.0')
 gi.require_version('GdkPixbuf', '2.0')
 from gi.repository import Gtk, Gdk, Pango, GdkPixbuf, GLib  # noqa
+requests = c.lazy_import('requests')
 
 
 class VisualizerBG(Gtk.DrawingArea):
@@ -10,10 +10,10 @@ from subprocess import Popen, run
 import threading
 import select
 import time
-import evdev
 import gi
 gi.require_version('Gtk', '4.0')
 from gi.repository import Gtk, GLib  # noqa
+evdev = c.lazy_import('evdev')
 
 
 # Button definitions: (label, icon, command-key, danger, short)
@@ -8,10 +8,166 @@ import common as c
 import os
 import gi
 import json
+import time
+import threading
 import subprocess
 gi.require_version('Gtk', '4.0')
 from gi.repository import Gtk  # noqa
 
+# Media classes whose active links mean something is capturing.
+CAPTURE_CLASSES = ('Audio/Source', 'Video/Source')
+
+# Seconds to wait before restarting pw-dump after it exits.
+MONITOR_RESTART_DELAY = 5
+
+
+def parse_graph(pw_data, nodes_map=None, links_map=None):
+    """
+    Apply a pw-dump object list to node and link maps, creating them if
+    not given. Objects with null info have been removed; others replace
+    only the fields they carry, so the partial objects pw-dump --monitor
+    prints for changes merge into what is already known.
+    """
+    nodes_map = {} if nodes_map is None else nodes_map
+    links_map = {} if links_map is None else links_map
+    for obj in pw_data:
+        obj_id = obj.get('id')
+        info = obj.get('info', {})
+        if info is None:
+            nodes_map.pop(obj_id, None)
+            links_map.pop(obj_id, None)
+            continue
+        obj_type = obj.get('type')
+        if obj_type == 'PipeWire:Interface:Node' or obj_id in nodes_map:
+            node = nodes_map.setdefault(obj_id, {'props': {}})
+            if 'props' in info:
+                node['props'] = info['props'] or {}
+            if 'state' in info:
+                node['state'] = info['state']
+        elif obj_type == 'PipeWire:Interface:Link' or obj_id in links_map:
+            link = links_map.setdefault(obj_id, {})
+            if 'output-node-id' in info:
+                link['output_node'] = info['output-node-id']
+            if 'input-node-id' in info:
+                link['input_node'] = info['input-node-id']
+            if 'state' in info:
+                link['state'] = info['state']
+    return nodes_map, links_map
+
+
+def active_captures(nodes_map, links_map):
+    """ Return the active links out of capture sources """
+    return frozenset(
+        link_id for link_id, link in links_map.items()
+        if link.get('state') == 'active'
+        and nodes_map.get(link.get('output_node'), {}).get(
+            'props', {}).get('media.class') in CAPTURE_CLASSES
+    )
+
+
+class PipeWireMonitor:
+    """
+    Follows the PipeWire graph through one long-running
+    'pw-dump --monitor' instead of a full dump per poll.
+
+    pw-dump prints the whole graph once, then a JSON array of the
+    objects that changed after every change. Each array ends with a
+    ']' line at column 0, which is what frames them. on_change() is
+    called from the monitor thread whenever an active link out of an
+    Audio/Source or Video/Source node appears or disappears.
+    """
+
+    def __init__(self, on_change):
+        self.on_change = on_change
+        self._lock = threading.Lock()
+        self._nodes = {}
+        self._links = {}
+        self._captures = frozenset()
+        self._process = None
+        self._running = False
+        self.ready = False
+
+    def start(self):
+        """ Start the monitor thread """
+        if self._running:
+            return
+        self._running = True
+        threading.Thread(
+            target=self._run, name='pybar-privacy-pipewire',
+            daemon=True).start()
+
+    def stop(self):
+        """ Stop the monitor and its pw-dump process """
+        self._running = False
+        self.ready = False
+        process = self._process
+        if process is not None:
+            try:
+                process.terminate()
+            except Exception:
+                pass
+
+    def graph(self):
+        """ Return copies of the node and link maps """
+        with self._lock:
+            return dict(self._nodes), dict(self._links)
+
+    def _apply(self, text):
+        """ Apply one framed JSON array from pw-dump """
+        try:
+            pw_data = json.loads(text)
+        except json.JSONDecodeError as e:
+            c.print_debug(
+                f"[PRIVACY] Bad pw-dump output: {e}", color='red')
+            return
+        with self._lock:
+            parse_graph(pw_data, self._nodes, self._links)
+            captures = active_captures(self._nodes, self._links)
+            changed = captures != self._captures
+            self._captures = captures
+            first = not self.ready
+            self.ready = True
+        if changed or first:
+            self.on_change()
+
+    def _run(self):
+        """ Run pw-dump --monitor, restarting it if it exits """
+        while self._running:
+            try:
+                process = subprocess.Popen(
+                    ['pw-dump', '--monitor', '--no-colors'],
+                    stdout=subprocess.PIPE,
+                    stderr=subprocess.DEVNULL,
+                    text=True,
+                    bufsize=1
+                )
+            except OSError as e:
+                # pw-dump isn't installed; polling falls back to nothing.
+                c.print_debug(
+                    f"[PRIVACY] Can't start pw-dump: {e}", color='red')
+                self._running = False
+                return
+            self._process = process
+            lines = []
+            try:
+                for line in process.stdout:
+                    lines.append(line)
+                    if line.rstrip() == ']':
+                        self._apply(''.join(lines))
+                        lines = []
+            finally:
+                process.stdout.close()
+                process.wait()
+                self._process = None
+                # The graph is unknown until pw-dump restarts.
+                with self._lock:
+                    self._nodes.clear()
+                    self._links.clear()
+                    self._captures = frozenset()
+                    self.ready = False
+            if self._running:
+                time.sleep(MONITOR_RESTART_DELAY)
+
 
 class Privacy(c.BaseModule):
     SCHEMA = {
@@ -19,7 +175,7 @@ class Privacy(c.BaseModule):
             'type': 'integer',
             'default': 3,
             'label': 'Update Interval',
-            'description': 'How often to check for active devices (seconds)',
+            'description': 'How often to check for webcam use (seconds)',
             'min': 1,
             'max': 30
         }
@@ -28,6 +184,22 @@ class Privacy(c.BaseModule):
     DEFAULT_INTERVAL = 3
     EMPTY_IS_ERROR = False
 
+    def __init__(self, name, config):
+        super().__init__(name, config)
+        # Audio and screen-share capture comes from the PipeWire
+        # monitor; polling only rescans /proc for webcams.
+        self.pipewire = PipeWireMonitor(self._on_graph_change)
+        self.pipewire.start()
+
+    def _on_graph_change(self):
+        """ Refresh now instead of on the next poll """
+        import module
+        module.force_update(self.name)
+
+    def cleanup(self):
+        """ Terminate the pw-dump monitor process """
+        self.pipewire.stop()
+
     def get_friendly_name(self, device_path):
         """
         Attempts to find a friendlier name for a device node.
@@ -107,7 +279,11 @@ class Privacy(c.BaseModule):
         Detect active audio/video devices using PipeWire
         Returns dict with same format as get_processes_using_devices()
         """
-        device_usage = {}
+        if self.pipewire.ready:
+            nodes_map, links_map = self.pipewire.graph()
+            return self.device_usage_from_graph(nodes_map, links_map)
+
+        # Monitor not (yet) running; take a one-off dump instead.
         try:
             result = subprocess.run(
                 ['pw-dump', '-N'],
@@ -127,34 +303,19 @@ class Privacy(c.BaseModule):
         except json.JSONDecodeError:
             return {}
 
-        # Build maps for quick lookup
-        nodes_map = {}
-        links_map = {}
-
-        for obj in pw_data:
-            obj_type = obj.get('type')
-            obj_id = obj.get('id')
-            info = obj.get('info', {})
-
-            if obj_type == 'PipeWire:Interface:Node':
-                nodes_map[obj_id] = {
-                    'props': info.get('props', {}),
-                    'state': info.get('state'),
-                    'max_input_ports': info.get('max-input-ports'),
-                    'n_input_ports': info.get('n-input-ports'),
-                }
-            elif obj_type == 'PipeWire:Interface:Link':
-                link_info = info
-                if link_info.get('state') == 'active':
-                    links_map[obj_id] = {
-                        'output_node': link_info.get('output-node-id'),
-                        'input_node': link_info.get('input-node-id'),
-                    }
+        nodes_map, links_map = parse_graph(pw_data)
+        return self.device_usage_from_graph(nodes_map, links_map)
+
+    def device_usage_from_graph(self, nodes_map, links_map):
+        """ Build device usage from PipeWire node and link maps """
+        device_usage = {}
 
         # Process active links to find device usage
         for link_id, link in links_map.items():
-            source_id = link['output_node']
-            target_id = link['input_node']
+            if link.get('state') != 'active':
+                continue
+            source_id = link.get('output_node')
+            target_id = link.get('input_node')
 
             source_node = nodes_map.get(source_id)
             target_node = nodes_map.get(target_id)
@@ -162,8 +323,8 @@ class Privacy(c.BaseModule):
             if not source_node or not target_node:
                 continue
 
-            source_props = source_node['props']
-            target_props = target_node['props']
+            source_props = source_node.get('props', {})
+            target_props = target_node.get('props', {})
 
             media_class = source_props.get('media.class', '')
             media_role = source_props.get('media.role', '')
@@ -4,16 +4,305 @@ Description: Pulse module refactored for unified state
 Author: thnikk
 """
 import weakref
+import itertools
 import common as c
-import pulsectl
 import threading
 import time
 import gi
 gi.require_version('Gtk', '4.0')
 from gi.repository import Gtk, Gdk, GLib, GObject, Pango  # noqa
+pulsectl = c.lazy_import('pulsectl')
+
+
+# Pulse facilities in the model, with the call that fetches one object.
+FACILITIES = {
+    'sink': 'sink_info',
+    'source': 'source_info',
+    'sink_input': 'sink_input_info',
+}
+
+# Seconds between attempts to interrupt event_listen() when stopping.
+STOP_RETRY = 0.1
+
+# The proplist keys the module reads; the rest isn't published.
+PROPLIST_KEYS = (
+    'application.name', 'application.process.binary', 'media.name')
+
+
+def serialize_device(d):
+    """ Convert a pulsectl object into the published dict """
+    # For programs (sink inputs), we often need to look at proplist
+    # for a name
+    name = getattr(d, 'name', None)
+    description = getattr(d, 'description', None)
+    proplist = getattr(d, 'proplist', None) or {}
+    proplist = {k: proplist[k] for k in PROPLIST_KEYS if k in proplist}
+
+    if not description:
+        description = proplist.get(
+            'application.name',
+            proplist.get('media.name', name or 'Unknown'))
+    if not name:
+        name = proplist.get(
+            'application.process.binary', description)
+
+    return {
+        'index': d.index,
+        'name': name,
+        'description': description,
+        'volume': d.volume.value_flat,
+        'mute': bool(d.mute),
+        'proplist': proplist
+    }
+
+
+class VolumeModel:
+    """
+    Sinks, sources and sink inputs keyed by facility and index, plus
+    the default sink and source names.
+
+    load() reads everything once per connection; after that apply()
+    re-reads only the object a Pulse event names, and reports whether
+    the published data changed.
+    """
+
+    def __init__(self, blacklist=None):
+        self.blacklist = blacklist or {}
+        self.objects = {facility: {} for facility in FACILITIES}
+        self.default_sink = None
+        self.default_source = None
+
+    def load(self, pulse):
+        """ Replace the model with a full listing """
+        self.objects = {
+            'sink': {d.index: serialize_device(d) for d in pulse.sink_list()},
+            'source': {
+                d.index: serialize_device(d) for d in pulse.source_list()},
+            'sink_input': {
+                d.index: serialize_device(d)
+                for d in pulse.sink_input_list()},
+        }
+        self.load_defaults(pulse)
+
+    def load_defaults(self, pulse):
+        """ Re-read the default sink and source; True if either moved """
+        info = pulse.server_info()
+        defaults = (info.default_sink_name, info.default_source_name)
+        changed = defaults != (self.default_sink, self.default_source)
+        self.default_sink, self.default_source = defaults
+        return changed
+
+    def apply(self, pulse, facility, index, removed=False):
+        """ Apply one new/change/remove event; True if anything changed """
+        if facility == 'server':
+            return self.load_defaults(pulse)
+        objects = self.objects.get(facility)
+        if objects is None:
+            return False
+        if not removed:
+            try:
+                device = serialize_device(
+                    getattr(pulse, FACILITIES[facility])(index))
+            except pulsectl.PulseError:
+                # Gone again before we could read it.
+                removed = True
+        if removed:
+            return objects.pop(index, None) is not None
+        if objects.get(index) == device:
+            return False
+        objects[index] = device
+        return True
+
+    def _allowed(self, devices, blocklist):
+        """ Devices in index order, minus blacklisted ones """
+        return [
+            d for _, d in sorted(devices.items())
+            if not blocklist or not any(
+                b in (d['name'] or '') or b in (d['description'] or '')
+                for b in blocklist)
+        ]
+
+    def _default(self, facility, name):
+        """ The device called name, or None """
+        return next((
+            d for d in self.objects[facility].values()
+            if d['name'] == name), None)
+
+    def snapshot(self):
+        """ Return the data in the format update_ui expects """
+        return {
+            'default_sink': self._default('sink', self.default_sink),
+            'default_source': self._default('source', self.default_source),
+            'outputs': self._allowed(
+                self.objects['sink'], self.blacklist.get('sinks', [])),
+            'inputs': self._allowed(
+                self.objects['source'], self.blacklist.get('sources', [])),
+            'programs': [d for _, d in sorted(
+                self.objects['sink_input'].items())],
+        }
+
+
+# Per-section lookup of one object by index.
+SECTION_INFO = {
+    'Outputs': 'sink_info',
+    'Inputs': 'source_info',
+    'Programs': 'sink_input_info',
+}
+
+
+class VolumeControl:
+    """
+    Runs volume actions on one long-lived Pulse connection owned by a
+    command thread, instead of connecting once per action.
+
+    Actions are queued under a key. Submitting under a key that is
+    still queued replaces that action's arguments (or merges them), so
+    a slider drag or a burst of scroll steps collapses into one call
+    with the latest value. Actions submitted with key None always run.
+    """
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        # key -> (func, args), run in insertion order
+        self._pending = {}
+        self._seq = itertools.count()
+        self._thread = None
+        self._pulse = None
+
+    def submit(self, key, func, *args, merge=None):
+        """ Queue func(pulse, *args) to run on the command thread """
+        with self._cond:
+            if key is None:
+                key = ('once', next(self._seq))
+            queued = self._pending.get(key)
+            if queued is not None and merge is not None:
+                args = merge(queued[1], args)
+            self._pending[key] = (func, args)
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name='pybar-volume-control',
+                    daemon=True)
+                self._thread.start()
+            self._cond.notify()
+
+    def _run(self):
+        """ Take queued actions one at a time and run them """
+        while True:
+            with self._cond:
+                while not self._pending:
+                    self._cond.wait()
+                key = next(iter(self._pending))
+                func, args = self._pending.pop(key)
+            self._execute(func, args)
+
+    def _execute(self, func, args):
+        """ Run one action, reconnecting once if the connection died """
+        for attempt in (0, 1):
+            try:
+                if self._pulse is None:
+                    self._pulse = pulsectl.Pulse('pybar-volume-control')
+                func(self._pulse, *args)
+                return
+            except pulsectl.PulseIndexError:
+                # The device went away; nothing to do.
+                return
+            except Exception as e:
+                if self._pulse is not None:
+                    try:
+                        self._pulse.close()
+                    except Exception:
+                        pass
+                    self._pulse = None
+                if attempt:
+                    c.print_debug(
+                        f"Volume action failed: {e}", name='volume',
+                        color='red')
+
+
+def _scroll_default(pulse, delta):
+    """ Nudge the default sink by delta, never past 100% """
+    default = pulse.sink_default_get()
+    if delta < 0:
+        pulse.volume_change_all_chans(default, delta)
+    elif default.volume.value_flat < 1:
+        pulse.volume_change_all_chans(
+            default, min(delta, 1 - default.volume.value_flat))
+    else:
+        pulse.volume_set_all_chans(default, 1)
+
+
+def _toggle_default_mute(pulse):
+    default = pulse.sink_default_get()
+    if default:
+        pulse.mute(default, not default.mute)
+
+
+def _cycle_output_device(pulse, blacklist):
+    sinks = pulse.sink_list()
+    if not sinks:
+        return
+
+    current = pulse.sink_default_get()
+    if not current:
+        return
+
+    # Filter out monitors and blacklisted devices
+    sink_bl = blacklist.get('sinks', [])
+    valid_sinks = []
+    for s in sinks:
+        desc = getattr(s, 'description', '') or ''
+        name = getattr(s, 'name', '') or ''
+        if 'Monitor of' in desc:
+            continue
+        if any(b in desc or b in name for b in sink_bl):
+            continue
+        valid_sinks.append(s)
+
+    if not valid_sinks:
+        return
+
+    # Find current index
+    idx = -1
+    for i, s in enumerate(valid_sinks):
+        if s.name == current.name:
+            idx = i
+            break
+
+    # Set next
+    next_sink = valid_sinks[(idx + 1) % len(valid_sinks)]
+    pulse.default_set(next_sink)
+
+
+def _mute(pulse, section, index, state):
+    if section in SECTION_INFO:
+        pulse.mute(getattr(pulse, SECTION_INFO[section])(index), state)
+
+
+def _set_volume(pulse, section, index, value):
+    if section in SECTION_INFO:
+        pulse.volume_set_all_chans(
+            getattr(pulse, SECTION_INFO[section])(index), value / 100)
+
+
+def _set_default(pulse, section, name):
+    if section == 'Outputs':
+        devices = pulse.sink_list()
+    elif section == 'Inputs':
+        devices = pulse.source_list()
+    else:
+        return
+    device = next((d for d in devices if d.name == name), None)
+    if device:
+        pulse.default_set(device)
+
+
+# Module-level singleton
+control = VolumeControl()
 
 
 class Volume(c.BaseModule):
+    DISPATCH_PRIORITY = 20  # Slider and scroll feedback
+
     SCHEMA = {
         'icons': {
             'type': 'dict',
@@ -23,215 +312,118 @@ class Volume(c.BaseModule):
         }
     }
 
-    def get_volume_data(self, pulse, blacklist=None):
-        """ Get current pulse data """
-        if blacklist is None:
-            blacklist = {}
+    def run_worker(self):
+        """
+        Background worker for volume. Blocks until Pulse reports an
+        event, then re-reads only the object it names and publishes
+        only if the data changed.
+        """
+        import module
+        stop_event = module._worker_stop_flags.get(self.name)
+        if stop_event is None:
+            stop_event = threading.Event()
+        model = VolumeModel(self.config.get('blacklist', {}))
+        current = [None]
+        exited = threading.Event()
+
+        def interrupt():
+            # event_listen_stop() does nothing unless the listen loop is
+            # running, so repeat it until the worker has returned.
+            stop_event.wait()
+            while not exited.is_set():
+                pulse = current[0]
+                if pulse is not None:
+                    try:
+                        pulse.event_listen_stop()
+                    except Exception:
+                        pass
+                exited.wait(STOP_RETRY)
+        threading.Thread(
+            target=interrupt, name=f'pybar-{self.name}-stop',
+            daemon=True).start()
+
         try:
-            default_sink = pulse.sink_default_get()
-            default_source = pulse.source_default_get()
-            sinks = pulse.sink_list()
-            sources = pulse.source_list()
-            sink_inputs = pulse.sink_input_list()
-
-            # Filter blacklisted devices
-            sink_bl = blacklist.get('sinks', [])
-            source_bl = blacklist.get('sources', [])
-
-            def is_allowed(device, blocklist):
-                if not blocklist:
-                    return True
-                name = getattr(device, 'name', '') or ''
-                desc = getattr(device, 'description', '') or ''
-                return not any(b in name or b in desc for b in blocklist)
-
-            sinks = [s for s in sinks if is_allowed(s, sink_bl)]
-            sources = [s for s in sources if is_allowed(s, source_bl)]
-
-            def serialize_device(d):
-                # For programs (sink inputs), we often need to look at proplist
-                # for a name
-                name = getattr(d, 'name', None)
-                description = getattr(d, 'description', None)
-                proplist = dict(d.proplist) if hasattr(d, 'proplist') else {}
-
-                if not description:
-                    description = proplist.get(
-                        'application.name',
-                        proplist.get('media.name', name or 'Unknown'))
-                if not name:
-                    name = proplist.get(
-                        'application.process.binary', description)
-
-                return {
-                    'index': d.index,
-                    'name': name,
-                    'description': description,
-                    'volume': d.volume.value_flat,
-                    'mute': bool(d.mute),
-                    'proplist': proplist
-                }
-
-            return {
-                'default_sink': serialize_device(default_sink)
-                if default_sink else None,
-                'default_source': serialize_device(default_source)
-                if default_source else None,
-                'outputs': [serialize_device(s) for s in sinks],
-                'inputs': [serialize_device(s) for s in sources],
-                'programs': [serialize_device(s) for s in sink_inputs]
-            }
-        except Exception as e:
-            c.print_debug(f"Error fetching volume data: {e}", color='red')
-            return None
+            self._listen(model, current, stop_event)
+        finally:
+            exited.set()
 
-    def run_worker(self):
-        """ Background worker for volume """
-        blacklist = self.config.get('blacklist', {})
-        while True:
+    def _listen(self, model, current, stop_event):
+        """Follow Pulse events until stop_event is set."""
+        while not stop_event.is_set():
             try:
                 with pulsectl.Pulse('pybar-volume-worker') as pulse:
-                    def update():
-                        try:
-                            data = self.get_volume_data(pulse, blacklist)
-                            if data:
-                                c.state_manager.update(self.name, data)
-                        except Exception as e:
-                            c.print_debug(
-                                f"Volume update failed: {e}", color='red')
-
-                    # Initial update
-                    update()
+                    pending = []
 
                     def event_callback(ev):
+                        facility = next(
+                            (f for f in (*FACILITIES, 'server')
+                             if ev.facility == f), None)
+                        if facility is not None:
+                            pending.append(
+                                (facility, ev.index, ev.t == 'remove'))
+                        # Pulse can't be queried from inside the callback
                         raise pulsectl.PulseLoopStop
 
-                    pulse.event_mask_set('sink', 'sink_input', 'source')
+                    pulse.event_mask_set(*FACILITIES, 'server')
                     pulse.event_callback_set(event_callback)
+                    current[0] = pulse
+
+                    # Subscribed first, so nothing is missed while loading
+                    model.load(pulse)
+                    if stop_event.is_set():
+                        return
+                    c.state_manager.update(self.name, model.snapshot())
 
                     while True:
-                        try:
-                            # Use timeout to allow checking stop flag
-                            pulse.event_listen(timeout=1)
-                        except pulsectl.PulseLoopStop:
-                            break
-                        except Exception:
-                            pass
-
-                        # Check stop flag
-                        import module
-                        stop_event = module._worker_stop_flags.get(self.name)
-                        if stop_event and stop_event.is_set():
-                            break
-
-                        update()
+                        # A stop during the load or the last update
+                        # would otherwise leave us blocked until the
+                        # next Pulse event.
+                        if stop_event.is_set():
+                            return
+                        pulse.event_listen()
+                        if stop_event.is_set():
+                            return
+                        events, pending[:] = pending[:], []
+                        changed = False
+                        for facility, index, removed in events:
+                            changed |= model.apply(
+                                pulse, facility, index, removed)
+                        if changed:
+                            c.state_manager.update(
+                                self.name, model.snapshot())
             except Exception as e:
                 c.print_debug(f"Volume worker error: {e}", color='red')
-                time.sleep(5)
+            finally:
+                current[0] = None
+            stop_event.wait(5)
 
     def handle_scroll(self, widget, dx, dy):
         """ Handle scroll on module """
-        with pulsectl.Pulse('volume-action') as pulse:
-            default = pulse.sink_default_get()
-            if dy > 0:
-                pulse.volume_change_all_chans(default, -0.01)
-            elif dy < 0:
-                if default.volume.value_flat < 1:
-                    pulse.volume_change_all_chans(default, 0.01)
-                else:
-                    pulse.volume_set_all_chans(default, 1)
+        if dy:
+            # Steps queued while the server is busy add up.
+            control.submit(
+                ('scroll',), _scroll_default, -0.01 if dy > 0 else 0.01,
+                merge=lambda old, new: (old[0] + new[0],))
 
     def toggle_default_mute(self):
         """ Toggle default sink mute """
-        with pulsectl.Pulse('volume-action') as pulse:
-            default = pulse.sink_default_get()
-            if default:
-                pulse.mute(default, not default.mute)
+        control.submit(None, _toggle_default_mute)
 
     def cycle_output_device(self, blacklist=None):
         """ Cycle through output devices """
-        if blacklist is None:
-            blacklist = {}
-        with pulsectl.Pulse('volume-action') as pulse:
-            sinks = pulse.sink_list()
-            if not sinks:
-                return
-
-            current = pulse.sink_default_get()
-            if not current:
-                return
-
-            # Filter out monitors and blacklisted devices
-            sink_bl = blacklist.get('sinks', [])
-            valid_sinks = []
-            for s in sinks:
-                desc = getattr(s, 'description', '') or ''
-                name = getattr(s, 'name', '') or ''
-                if 'Monitor of' in desc:
-                    continue
-                if any(b in desc or b in name for b in sink_bl):
-                    continue
-                valid_sinks.append(s)
-
-            if not valid_sinks:
-                return
-
-            # Find current index
-            idx = -1
-            for i, s in enumerate(valid_sinks):
-                if s.name == current.name:
-                    idx = i
-                    break
-
-            # Set next
-            next_sink = valid_sinks[(idx + 1) % len(valid_sinks)]
-            pulse.default_set(next_sink)
+        control.submit(None, _cycle_output_device, blacklist or {})
 
     def toggle_mute(self, section, index, state):
-        with pulsectl.Pulse('volume-action') as pulse:
-            dev = None
-            if section == 'Outputs':
-                dev = next((s for s in pulse.sink_list()
-                           if s.index == index), None)
-            elif section == 'Inputs':
-                dev = next((s for s in pulse.source_list()
-                           if s.index == index), None)
-            elif section == 'Programs':
-                dev = next((s for s in pulse.sink_input_list()
-                           if s.index == index), None)
-
-            if dev:
-                pulse.mute(dev, state)
+        control.submit(('mute', section, index), _mute, section, index, state)
         return True
 
     def set_dev_volume(self, section, index, value):
-        with pulsectl.Pulse('volume-action') as pulse:
-            dev = None
-            if section == 'Outputs':
-                dev = next((s for s in pulse.sink_list()
-                           if s.index == index), None)
-            elif section == 'Inputs':
-                dev = next((s for s in pulse.source_list()
-                           if s.index == index), None)
-            elif section == 'Programs':
-                dev = next((s for s in pulse.sink_input_list()
-                           if s.index == index), None)
-
-            if dev:
-                pulse.volume_set_all_chans(dev, value / 100)
+        # A slider drag only needs its latest position applied.
+        control.submit(
+            ('volume', section, index), _set_volume, section, index, value)
 
     def set_default(self, section, name):
-        with pulsectl.Pulse('volume-action') as pulse:
-            if section == 'Outputs':
-                sink = next(
-                    (s for s in pulse.sink_list() if s.name == name), None)
-                if sink:
-                    pulse.default_set(sink)
-            elif section == 'Inputs':
-                source = next((s for s in pulse.source_list()
-                              if s.name == name), None)
-                if source:
-                    pulse.default_set(source)
+        control.submit(('default', section), _set_default, section, name)
 
     def build_device_row(self, section, device, default_name=None):
         """Build a VolumeSliderRow for a single pulse device."""
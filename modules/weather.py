@@ -6,11 +6,11 @@ Author: thnikk
 """
 from datetime import datetime, timedelta
 import weakref
-import requests
 import common as c
 import gi
 gi.require_version('Gtk', '4.0')
 from gi.repository import Gtk, Pango  # noqa
+requests = c.lazy_import('requests')
 
 
 class Weather(c.BaseModule):
@@ -3,10 +3,6 @@
 Description: Properly threaded workspace module refactored for unified state
 Author: thnikk
 """
-from subprocess import Popen, PIPE, STDOUT, DEVNULL, run, CalledProcessError
-import socket
-import json
-import os
 import weakref
 import common as c
 import gi
@@ -15,6 +11,8 @@ from gi.repository import Gtk, Gdk, GLib, GObject  # noqa
 
 
 class Workspaces(c.BaseModule):
+    DISPATCH_PRIORITY = 10  # Direct feedback for keybindings
+
     SCHEMA = {
         'icons': {
             'type': 'dict',
@@ -48,120 +46,82 @@ class Workspaces(c.BaseModule):
         }
     }
 
+    # Events that change the workspace model. Sway uses the first two;
+    # the rest are Hyprland's.
+    EVENTS = (
+        'workspace', 'output', 'focusedmon', 'createworkspace',
+        'destroyworkspace', 'moveworkspace', 'renameworkspace',
+        'monitoradded', 'monitorremoved',
+    )
+
     def get_wm(self):
-        try:
-            run(['swaymsg', '-t', 'get_version'], capture_output=False,
-                check=True, stdout=DEVNULL, stderr=DEVNULL)
-            return 'sway'
-        except CalledProcessError:
-            return 'hypr'
+        return c.compositor.wm
 
     def get_workspaces_data(self, wm):
-        """ Get current workspace info """
-        if wm == 'sway':
-            try:
-                raw = json.loads(run(
-                    ['swaymsg', '-t', 'get_workspaces'],
-                    check=True, capture_output=True).stdout.decode('utf-8'))
-                workspaces = [workspace['name'] for workspace in raw]
-                workspaces.sort()
-                focused = next((
-                    workspace['name'] for workspace in raw
-                    if workspace['focused']), None)
-                monitors = sorted(
-                    set(w['output'] for w in raw),
-                    key=lambda x: x.lower())
-                monitor_map = {
-                    w['name']: str(monitors.index(w['output']) + 1)
-                    for w in raw}
-                # Track visible workspaces across all monitors
-                visible = [
-                    workspace['name'] for workspace in raw
-                    if workspace.get('visible', False)
-                ]
-                return {
-                    'workspaces': workspaces,
-                    'focused': focused,
-                    'monitors': monitor_map,
-                    'visible': visible
-                }
-            except Exception:
-                return None
-        else:
-            try:
-                raw = json.loads(run(
-                    ['hyprctl', '-j', 'workspaces'],
-                    check=True, capture_output=True).stdout.decode('utf-8'))
-                workspaces = sorted([w['name'] for w in raw])
-                focused = json.loads(run(
-                    ['hyprctl', '-j', 'activeworkspace'],
-                    check=True, capture_output=True
-                ).stdout.decode('utf-8'))['name']
-                monitors = sorted(
-                    set(w['monitor'] for w in raw),
-                    key=lambda x: x.lower())
-                monitor_map = {
-                    w['name']: str(monitors.index(w['monitor']) + 1)
-                    for w in raw}
-                # Get active workspaces per monitor (use name for
-                # consistency with workspaces list)
-                monitors_data = json.loads(run(
-                    ['hyprctl', '-j', 'monitors'],
-                    check=True, capture_output=True
-                ).stdout.decode('utf-8'))
-                visible = [
-                    str(m['activeWorkspace']['name'])
-                    for m in monitors_data
-                ]
-                return {
-                    "workspaces": workspaces,
-                    "focused": focused,
-                    "monitors": monitor_map,
-                    "visible": visible
-                }
-            except Exception:
-                return None
-
-    def run_worker(self):
-        """ Worker thread for workspaces """
+        """ Query full workspace info and reset the model from it """
+        client = c.compositor.client
+        try:
+            if wm == 'sway':
+                self._model.reset_sway(client.get_workspaces())
+            else:
+                self._model.reset_hyprland(
+                    client.request('workspaces'),
+                    client.request('monitors'))
+        except (c.CompositorError, KeyError, TypeError) as e:
+            c.print_debug(
+                f"Failed to query workspaces: {e}", name=self.name,
+                color='red')
+            return None
+        return self._model.snapshot()
+
+    def on_event(self, event, payload):
+        """ Apply a compositor event to the model (compositor thread) """
         wm = self.get_wm()
-
-        def update():
+        if event == 'connected':
+            # Resync; events may have been missed while disconnected.
+            changed = None
+        elif wm == 'sway':
+            changed = self._model.apply_sway(payload) \
+                if event == 'workspace' else None
+        else:
+            changed = self._model.apply_hyprland(event, payload)
+        if changed is None:
             data = self.get_workspaces_data(wm)
-            if data:
-                c.state_manager.update(self.name, data)
-
-        update()
-
-        if wm == 'sway':
-            while True:
-                with Popen(
-                        ['swaymsg', '-t', 'subscribe', '["workspace"]', '-m'],
-                        stdin=PIPE, stdout=PIPE, stderr=STDOUT) as p:
-                    if p.stdout:
-                        for _line in p.stdout:
-                            update()
+        elif changed:
+            data = self._model.snapshot()
         else:
-            with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
-                try:
-                    sock.connect(
-                        f"{os.getenv('XDG_RUNTIME_DIR')}/hypr/"
-                        f"{os.getenv('HYPRLAND_INSTANCE_SIGNATURE')}/"
-                        ".socket2.sock")
-                    while True:
-                        data = sock.recv(1024).decode('utf-8')
-                        if 'focus' in data or 'workspace' in data:
-                            update()
-                except Exception:
-                    pass
+            return
+        if data:
+            c.state_manager.update(self.name, data)
+
+    def run_worker(self):
+        """ Follow workspace events from the shared compositor bus """
+        import module
+        if self.get_wm() is None:
+            c.print_debug(
+                "No supported compositor found", name=self.name,
+                color='red')
+            return
+        self._model = c.WorkspaceModel()
+        sub_id = c.compositor.subscribe(self.on_event, self.EVENTS)
+        stop_event = module._worker_stop_flags.get(self.name)
+        if stop_event:
+            stop_event.wait()
+            c.compositor.unsubscribe(sub_id)
 
     def switch_workspace(self, n):
-        if self.get_wm() == 'sway':
-            run(['swaymsg', 'workspace', 'number', str(n)],
-                stdout=DEVNULL, stderr=DEVNULL, check=False)
-        else:
-            run(['hyprctl', 'dispatch', 'workspace', str(n)],
-                stdout=DEVNULL, stderr=DEVNULL, check=False)
+        client = c.compositor.client
+        if client is None:
+            return
+        try:
+            if self.get_wm() == 'sway':
+                client.command(f'workspace number {n}')
+            else:
+                client.command(f'workspace {n}')
+        except c.CompositorError as e:
+            c.print_debug(
+                f"Failed to switch workspace: {e}", name=self.name,
+                color='red')
 
     def create_widget(self, bar):
         """ Create workspaces widget """
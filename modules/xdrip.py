@@ -4,15 +4,18 @@ Description: XDrip module refactored for unified state
 Author: thnikk
 """
 import weakref
-import requests
 from datetime import datetime, timezone
 import common as c
 import gi
 gi.require_version('Gtk', '4.0')
 from gi.repository import Gtk  # noqa
+requests = c.lazy_import('requests')
 
 
 class XDrip(c.BaseModule):
+    # Derived from history; rebuilt on every fetch.
+    TRANSIENT_FIELDS = ('history_labels',)
+
     SCHEMA = {
         'ip': {
             'type': 'string',
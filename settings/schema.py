@@ -156,6 +156,17 @@ GLOBAL_SCHEMA = {
         'min': 0.0,
         'max': 1.0,
         'step': 0.05
+    },
+    'stall-budget': {
+        'type': FieldType.INTEGER,
+        'default': 8,
+        'label': 'Stall Budget',
+        'description': (
+            'Log UI callbacks that block the bar for longer than this '
+            'many milliseconds (0 disables)'
+        ),
+        'min': 0,
+        'max': 1000
     }
 }
 
@@ -263,8 +274,3 @@ def validate_config_section(config, schema):
         if value is not None and not validate_field(value, field):
             errors.append(f"Invalid value for '{key}': {value}")
     return errors
-
-
-def get_module_schema(module_class):
-    """Get schema from a module class, if defined"""
-    return getattr(module_class, 'SCHEMA', {})
@@ -11,7 +11,6 @@ gi.require_version("Adw", "1")
 from gi.repository import Gtk, Gdk, GObject, Graphene, Adw
 
 from settings.widgets.editors import create_editor
-from settings.schema import get_module_schema
 import module as mod
 
 
@@ -672,9 +671,9 @@ class ModuleSettingsGroup(Adw.PreferencesGroup):
         module_config = config.get("modules", {}).get(module_name, {})
         module_type = module_config.get("type", module_name)
 
-        module_class = mod.get_module_class(module_type)
+        schema = mod.get_module_schema(module_type)
 
-        if not module_class:
+        if schema is None:
             # Re-add placeholder for no settings
             placeholder_row = Adw.ActionRow()
             placeholder_label = Gtk.Label(
@@ -690,8 +689,6 @@ class ModuleSettingsGroup(Adw.PreferencesGroup):
             self._current_rows.append(placeholder_row)
             return
 
-        schema = get_module_schema(module_class)
-
         header_text = (
             f"{module_name} ({module_type})"
             if module_type != module_name
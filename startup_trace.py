@@ -0,0 +1,133 @@
+#!/usr/bin/python3 -u
+"""
+Description: Startup timeline recorder writing Chrome trace JSON
+Author: thnikk
+"""
+import os
+import json
+import time
+import logging
+import threading
+import contextlib
+
+TRACE_PATH = os.path.expanduser('~/.cache/pybar/startup-trace.json')
+
+# Give up waiting for every bar's first paint after this many seconds.
+TRACE_TIMEOUT = 15
+
+
+class StartupTracer:
+    """
+    Records startup phases as Chrome trace events.
+
+    Disabled by default, so span() and instant() cost one attribute
+    check when --trace-startup isn't given. Import this before anything
+    heavy; it depends on the standard library only. Timestamps are
+    monotonic microseconds since the tracer was created. The finished
+    trace loads in chrome://tracing, Perfetto or speedscope.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self._origin = time.perf_counter()
+        self._events = []
+        self._threads = {}
+        self._lock = threading.Lock()
+        self._pending_paints = set()
+        self._dumped = False
+
+    def enable(self):
+        """Start recording."""
+        self.enabled = True
+
+    def _now(self):
+        """Return microseconds since the tracer was created."""
+        return (time.perf_counter() - self._origin) * 1e6
+
+    def _record(self, event):
+        """Append an event tagged with the current thread."""
+        thread = threading.current_thread()
+        tid = thread.native_id or thread.ident
+        event['pid'] = os.getpid()
+        event['tid'] = tid
+        with self._lock:
+            self._threads[tid] = thread.name
+            self._events.append(event)
+
+    @contextlib.contextmanager
+    def span(self, name, cat='startup', **args):
+        """Record the duration of the with-block as one event."""
+        if not self.enabled:
+            yield
+            return
+        start = self._now()
+        try:
+            yield
+        finally:
+            event = {
+                'name': name, 'cat': cat, 'ph': 'X',
+                'ts': round(start, 1),
+                'dur': round(self._now() - start, 1),
+            }
+            if args:
+                event['args'] = args
+            self._record(event)
+
+    def instant(self, name, cat='startup', **args):
+        """Record a point in time."""
+        if not self.enabled:
+            return
+        event = {
+            'name': name, 'cat': cat, 'ph': 'i', 's': 'p',
+            'ts': round(self._now(), 1),
+        }
+        if args:
+            event['args'] = args
+        self._record(event)
+
+    def expect_paint(self, name):
+        """Note a bar whose first paint should end the trace."""
+        if self.enabled:
+            self._pending_paints.add(name)
+
+    def painted(self, name):
+        """Record a bar's first paint; dump once every bar has painted."""
+        if not self.enabled:
+            return
+        self.instant(f'first paint {name}', cat='paint')
+        self._pending_paints.discard(name)
+        if not self._pending_paints:
+            self.dump()
+
+    def dump(self, path=TRACE_PATH):
+        """Write the trace once; later calls do nothing."""
+        if not self.enabled or self._dumped:
+            return None
+        self._dumped = True
+        # Later hotplugs and reloads aren't part of startup.
+        self.enabled = False
+        with self._lock:
+            events = list(self._events)
+            threads = dict(self._threads)
+        pid = os.getpid()
+        for tid, name in threads.items():
+            events.append({
+                'name': 'thread_name', 'ph': 'M', 'pid': pid, 'tid': tid,
+                'args': {'name': name},
+            })
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, 'w') as f:
+                json.dump({
+                    'traceEvents': events,
+                    'displayTimeUnit': 'ms',
+                }, f)
+        except OSError as e:
+            logging.error(f"Failed to write startup trace: {e}")
+            return None
+        logging.info(f"Startup trace written to {path}")
+        return path
+
+
+# Module-level singleton
+tracer = StartupTracer()
@@ -0,0 +1,29 @@
+"""
+Description: Tests for the timer-wheel scheduler
+Author: thnikk
+"""
+import threading
+import time
+from module import Scheduler
+
+
+def test_delay_past_one_revolution_keeps_running():
+    """A job whose delay exceeds the wheel span is still rescheduled."""
+    # 16 slots of 10 ms cover 0.16 s, so a 0.3 s delay wraps the wheel.
+    scheduler = Scheduler(tick=0.01, slots=16, workers=1)
+    runs = []
+    done = threading.Event()
+
+    def poll(first_run):
+        runs.append(time.monotonic())
+        if len(runs) >= 4:
+            done.set()
+        return 0.3
+
+    scheduler.add('long', poll)
+    try:
+        assert done.wait(3), f'job ran {len(runs)} times, expected 4'
+    finally:
+        scheduler.remove_all()
+    gaps = [b - a for a, b in zip(runs, runs[1:])]
+    assert all(gap >= 0.25 for gap in gaps), gaps